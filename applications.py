@@ -1,14 +1,26 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import List, Optional
-from pydantic import BaseModel, validator, ConfigDict
-from datetime import datetime
-from models import EventType
-
-from db import db, collection
-from models import EventApplication, User
+from pydantic import BaseModel, Field
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from db import db
+from models import ApplicationCreate, EventApplication, EventApplicationSummary, ImportResult, ImportRowError, User
+from core.config import settings
 from security import role_checker
-from bot import send_notif
+from booking_index import booking_index
+from room_catalog import RoomCatalogUnavailable, room_catalog
+import reservations
+from pagination import fetch_page, find_after, page_size
+from fieldsets import Fieldset, fieldset
+from responses import NEXT_CURSOR_HEADER, ndjson_response, render_json, wants_ndjson
+from feed_cache import feed_cache
+from notifications import notify_moderation, notify_moderations
+from live import publish_moderation
+from bulk_io import csv_records, iter_lines, ndjson_records, validation_detail
+import recurrence
+from recurrence import IntervalSet, intervals, overlaps, span_filter
 router = APIRouter()
 
 
@@ -17,74 +29,145 @@ class ModerationRequest(BaseModel):
     curator_comment: Optional[str] = None
 
 
-class ApplicationCreate(BaseModel):
-    title: str
-    description: str
-    start_time: datetime
-    end_time: datetime
-    expected_participants: int
-    needs: str
-    image_url: str | None = None
-    event_type: EventType
-    location: dict | None = None
-    
-    model_config = ConfigDict(use_enum_values=True)
-
-    @validator("location", always=True)
-    def validate_location(cls, v, values):
-        event_type = values.get("event_type")
-        if event_type == EventType.ONLINE:
-            if v is not None:
-                raise ValueError("Местоположение не должно быть указано для ОНЛАЙН мероприятия.")
-        elif event_type == EventType.OFFLINE:
-            if v is None:
-                raise ValueError("Местоположение обязательно для ОФФЛАЙН мероприятия.")
-
-            if "type" not in v or v["type"] not in ["dukat", "custom"]:
-                raise ValueError("Тип местоположения должен быть 'dukat' или 'custom'.")
-
-            if v["type"] == "dukat":
-                tower = v.get("tower")
-                room_number = v.get("room_number")
-                if tower not in ["F", "B"] or not room_number:
-                    raise ValueError("Неверные данные местоположения Dukat.")
-            elif v["type"] == "custom":
-                if not v.get("address"):
-                    raise ValueError("Адрес обязателен для пользовательского местоположения.")
-        return v
-
-
 @router.post("/", response_model=EventApplication, status_code=status.HTTP_201_CREATED)
 async def create_application(
     application_data: ApplicationCreate,
     current_user: User = Depends(role_checker(["student", "curator"])),
 ):
+    data = new_application_document(application_data, current_user)
+    await db.applications.insert_one(data)
+    return EventApplication(**data)
+
+
+def new_application_document(application_data: ApplicationCreate, organizer: User) -> dict:
     data = application_data.model_dump(mode="python")
     data.update(
-        organizer_id=str(current_user.id),
-        organizer_name=current_user.full_name,
+        organizer_id=str(organizer.id),
+        organizer_name=organizer.full_name,
         status="pending",
         _id=str(uuid.uuid4()),
     )
+    # Поле rrule есть только у серий — по его наличию запросы отличают их от разовых заявок
+    if data.get("rrule"):
+        data["series_end"] = recurrence.series_end(data["rrule"], data["start_time"], data["end_time"])
+    else:
+        data.pop("rrule", None)
+    return data
 
-    await db.applications.insert_one(data)
-    return EventApplication(**data)
+
+MAX_IMPORT_ERRORS = 100
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_applications(
+    request: Request,
+    format: Optional[str] = None,
+    current_user: User = Depends(role_checker(["student", "curator"])),
+):
+    """
+    Bulk import from an NDJSON or CSV body (dotted CSV columns like location.tower).
+    Rows are validated like POST / and inserted in batches while the body streams in;
+    every row is either inserted or reported as failed.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Поддерживаются форматы ndjson и csv")
+
+    # Строки проверяются по каталогу комнат; без него 503 до первой вставки, а не на середине файла
+    if not room_catalog.loaded:
+        raise RoomCatalogUnavailable()
+
+    lines = iter_lines(request.stream())
+    records = csv_records(lines) if format == "csv" else ndjson_records(lines)
+    result = ImportResult()
+    batch, batch_lines = [], []
+    async for line, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            application_data = ApplicationCreate.model_validate(record)
+        except ValueError as exc:
+            import_failed(result, line, validation_detail(exc))
+            continue
+        batch.append(new_application_document(application_data, current_user))
+        batch_lines.append(line)
+        if len(batch) >= settings.import_batch_size:
+            await insert_import_batch(batch, batch_lines, result)
+            batch, batch_lines = [], []
+    if batch:
+        await insert_import_batch(batch, batch_lines, result)
+    return result
+
+
+def import_failed(result: ImportResult, line: int, detail: str):
+    result.failed += 1
+    if len(result.errors) < MAX_IMPORT_ERRORS:
+        result.errors.append(ImportRowError(line=line, detail=detail))
+
+
+async def insert_import_batch(batch: List[dict], lines: List[int], result: ImportResult):
+    """Insert one batch; rows that were not written are reported as failed instead of aborting the import."""
+    try:
+        await db.applications.insert_many(batch, ordered=False)
+    except BulkWriteError as exc:
+        # ordered=False: остальные документы пакета записаны, ошибки приходят с индексом в пакете
+        result.inserted += exc.details["nInserted"]
+        for error in exc.details["writeErrors"]:
+            import_failed(result, lines[error["index"]], error["errmsg"])
+        return
+    except PyMongoError as exc:
+        for line in lines:
+            import_failed(result, line, f"Не удалось сохранить строку: {exc}")
+        return
+    result.inserted += len(batch)
 
 
-@router.get("/pendings", response_model=List[EventApplication])
+application_fields = fieldset(EventApplication, EventApplicationSummary)
+
+
+@router.get("/pendings", response_model=List[EventApplicationSummary])
 async def get_pendings_applications(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    format: Optional[str] = None,
+    fields: Fieldset = Depends(application_fields),
     current_user: User = Depends(role_checker(["student", "curator", "admin"])),
 ):
+    query = {"status": "pending"}
     if current_user.role == "student":
-        applications = await db.applications.find({"organizer_id": current_user.id, "status": "pending"}).to_list(None)
-        return applications
+        query["organizer_id"] = current_user.id
+
+    if wants_ndjson(request, format):
+        return ndjson_response(find_after(db.applications, query, cursor, fields.projection), fields.model, trusted=True)
+
+    applications, next_cursor = await fetch_page(db.applications, query, cursor, limit, fields.projection)
+    return Response(
+        content=render_json(fields.model, applications, trusted=True),
+        media_type="application/json",
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
+    )
 
-    applications = await db.applications.find({"status": "pending"}).to_list(None)
-    return applications
 
-@router.get("/all", response_model=List[EventApplication])
-async def get_all_applications_():
-    return await db.applications.find({"status": "approved"}).to_list(None)
+@router.get("/all", response_model=List[EventApplicationSummary])
+async def get_all_applications_(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    format: Optional[str] = None,
+    fields: Fieldset = Depends(application_fields),
+):
+    query = {"status": "approved"}
+
+    if wants_ndjson(request, format):
+        return ndjson_response(find_after(db.applications, query, cursor, fields.projection), fields.model, trusted=True)
+
+    async def render():
+        applications, next_cursor = await fetch_page(db.applications, query, cursor, limit, fields.projection)
+        return render_json(fields.model, applications, trusted=True), {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+    return await feed_cache.serve(request, render)
 
 
 @router.get("/one/{id}", response_model=EventApplication)
@@ -108,27 +191,197 @@ async def moderate_application(
     if application is None or current_user.role not in ["curator", "admin"]:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Заявка не найдена")
 
-    if moderation.status == "approved":
+    room_id = (application.get("location") or {}).get("room_id")
+    booked = intervals(application)
+    claimed = False
+    if moderation.status == "approved" and room_id:
+        # Проверка пересечения и бронь — одна атомарная запись в журнал комнаты (для серии — один bulk_write)
+        if not await reservations.claim_intervals(id, room_id, booked):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Комната уже забронирована на это время")
+        claimed = application["status"] != "approved"
+    elif moderation.status == "approved":
         request = {
             "status": "approved",
             "_id": {"$ne": id},
-            "start_time": {"$lt": application["end_time"]},
-            "end_time": {"$gt": application["start_time"]},
+            **span_filter(booked[0][0], booked[-1][1]),
         }
-        if application.get("location") and application["location"].get("room_id"):
-            request["location.room_id"] = application["location"]["room_id"]
-        conflicting_applications = await db.applications.find(request).to_list(1)
+        candidates = await db.applications.find(request, {"start_time": 1, "end_time": 1, "rrule": 1}).to_list(None)
 
-        if conflicting_applications:
+        if any(overlaps(booked, intervals(other)) for other in candidates):
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Комната уже забронирована на это время")
 
     update_data = {
         "status": moderation.status,
         "curator_comment": moderation.curator_comment,
     }
-    await db.applications.update_one({"_id": id}, {"$set": update_data})
-    ststus_changed_user_tg = collection.find_one("user_tg_id")
-    if ststus_changed_user_tg:
-        await send_notif(status, ststus_changed_user_tg)
+    try:
+        await db.applications.update_one({"_id": id}, {"$set": update_data})
+    except Exception:
+        if claimed:
+            await reservations.release_intervals(id, room_id, booked)
+        raise
+    if application["status"] == "approved" and moderation.status != "approved" and room_id:
+        await reservations.release_intervals(id, room_id, booked)
+    if "approved" in (application["status"], moderation.status) and application["status"] != moderation.status:
+        await feed_cache.invalidate()
     updated_application = await db.applications.find_one({"_id": id})
-    return updated_application
\ No newline at end of file
+    booking_index.apply(updated_application)
+    # Уведомление уходит через outbox, отправляет его фоновый воркер
+    await notify_moderation(updated_application)
+    await publish_moderation(updated_application)
+    return updated_application
+
+class ModerationDecision(ModerationRequest):
+    id: str
+
+
+class BulkModerationRequest(BaseModel):
+    decisions: List[ModerationDecision] = Field(..., min_length=1, max_length=500)
+
+
+class ModerationResult(BaseModel):
+    id: str
+    status_code: int
+    detail: Optional[str] = None
+    application: Optional[EventApplication] = None
+
+
+@router.patch("/moderate", response_model=List[ModerationResult])
+async def moderate_applications(
+    request: BulkModerationRequest,
+    current_user: User = Depends(role_checker(["curator"])),
+):
+    """
+    Moderate a batch of applications in a handful of DB operations.
+    Conflicts are checked inside the batch and against existing bookings; results are per item.
+    """
+    decisions = request.decisions
+    results: List[Optional[ModerationResult]] = [None] * len(decisions)
+
+    ids = []
+    for i, decision in enumerate(decisions):
+        if decision.id in ids:
+            results[i] = ModerationResult(id=decision.id, status_code=status.HTTP_400_BAD_REQUEST, detail="Заявка повторяется в пакете")
+        else:
+            ids.append(decision.id)
+    applications = {
+        application["_id"]: application
+        for application in await db.applications.find({"_id": {"$in": ids}}).to_list(None)
+    }
+
+    def conflict(i):
+        results[i] = ModerationResult(
+            id=decisions[i].id,
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Комната уже забронирована на это время",
+        )
+
+    # Пересечения внутри пакета: заявки одобряются в порядке следования
+    accepted_by_room = defaultdict(IntervalSet)
+    accepted_all = IntervalSet()
+    room_claims = {}
+    roomless_approvals = []
+    for i, decision in enumerate(decisions):
+        if results[i] is not None:
+            continue
+        application = applications.get(decision.id)
+        if application is None:
+            results[i] = ModerationResult(id=decision.id, status_code=status.HTTP_404_NOT_FOUND, detail="Заявка не найдена")
+            continue
+        if decision.status != "approved":
+            continue
+        room_id = (application.get("location") or {}).get("room_id")
+        booked = intervals(application)
+        taken = accepted_by_room[room_id] if room_id else accepted_all
+        if taken.overlaps_any(booked):
+            conflict(i)
+            continue
+        accepted_by_room[room_id].add(booked)
+        accepted_all.add(booked)
+        if room_id:
+            room_claims[decision.id] = (i, room_id, booked)
+        else:
+            roomless_approvals.append((i, booked))
+
+    # Заявки без комнаты проверяются как раньше, но одним запросом на весь пакет
+    if roomless_approvals:
+        existing = await db.applications.find(
+            {
+                "status": "approved",
+                "$or": [span_filter(booked[0][0], booked[-1][1]) for _, booked in roomless_approvals],
+            },
+            {"start_time": 1, "end_time": 1, "rrule": 1},
+        ).to_list(None)
+        existing_intervals = [(other["_id"], intervals(other)) for other in existing]
+        for i, booked in roomless_approvals:
+            if any(
+                other_id != decisions[i].id and overlaps(booked, other_booked)
+                for other_id, other_booked in existing_intervals
+            ):
+                conflict(i)
+
+    # Все вхождения всех серий пакета бронируются одним bulk_write
+    claimed = await reservations.claim_many(
+        (application_id, room_id, start_time, end_time)
+        for application_id, (_, room_id, booked) in room_claims.items()
+        for start_time, end_time in booked
+    )
+    for application_id, (i, *_) in room_claims.items():
+        if application_id not in claimed:
+            conflict(i)
+
+    accepted = [(i, decision) for i, decision in enumerate(decisions) if results[i] is None]
+    fresh_claims, releases = [], []
+    for _, decision in accepted:
+        application = applications[decision.id]
+        room_id = (application.get("location") or {}).get("room_id")
+        if not room_id:
+            continue
+        keys = [
+            (decision.id, key)
+            for start_time, end_time in intervals(application)
+            for key, _ in reservations.day_keys(room_id, start_time, end_time)
+        ]
+        if decision.status == "approved" and application["status"] != "approved":
+            fresh_claims.extend(keys)
+        elif decision.status != "approved" and application["status"] == "approved":
+            releases.extend(keys)
+
+    if accepted:
+        try:
+            await db.applications.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": decision.id},
+                        {"$set": {"status": decision.status, "curator_comment": decision.curator_comment}},
+                    )
+                    for _, decision in accepted
+                ],
+                ordered=False,
+            )
+        except Exception:
+            await reservations.release_many(fresh_claims)
+            raise
+        await reservations.release_many(releases)
+
+    updated = {}
+    if accepted:
+        updated = {
+            application["_id"]: application
+            for application in await db.applications.find({"_id": {"$in": [d.id for _, d in accepted]}}).to_list(None)
+        }
+    for application in updated.values():
+        booking_index.apply(application)
+    if any(
+        "approved" in (applications[decision.id]["status"], decision.status)
+        and applications[decision.id]["status"] != decision.status
+        for _, decision in accepted
+    ):
+        await feed_cache.invalidate()
+    await notify_moderations(list(updated.values()))
+    for application in updated.values():
+        await publish_moderation(application)
+
+    for i, decision in accepted:
+        results[i] = ModerationResult(id=decision.id, status_code=status.HTTP_200_OK, application=updated.get(decision.id))
+    return results
@@ -1,45 +1,96 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from pymongo.errors import DuplicateKeyError
 
-from models import User, UserCreate, Token, OAuth2PasswordRequestForm
-from security import get_password_hash, verify_password, create_access_token, create_refresh_token, get_current_user, get_user_from_db
+from models import User, UserCreate, Token, RefreshRequest, OAuth2PasswordRequestForm
+from security import get_current_user, principal_cache
+from refresh_tokens import RefreshTokenInvalid, issue_tokens, rotate
+from hashing import HashPoolBusy, password_hasher
+from core.config import settings
 from db import db
 from typing import Optional
 
 router = APIRouter()
 
+
+def hash_pool_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервер перегружен, попробуйте позже",
+        headers={"Retry-After": "1"},
+    )
+
+
+def email_taken_exception():
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Email уже зарегистрирован",
+    )
+
+
+async def rehash_password(user_id: str, password: str, old_hash: str):
+    try:
+        new_hash = await password_hasher.hash(password)
+    except HashPoolBusy:
+        return  # перехешируем при следующем входе
+    await db.users.update_one(
+        {"_id": user_id, "hashed_password": old_hash},
+        {"$set": {"hashed_password": new_hash}},
+    )
+    principal_cache.invalidate(user_id)
+
+
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(user_in: UserCreate):
     user = await db.users.find_one({"email": user_in.email})
     if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email уже зарегистрирован",
-        )
-    hashed_password = get_password_hash(user_in.password)
+        raise email_taken_exception()
+    try:
+        hashed_password = await password_hasher.hash(user_in.password)
+    except HashPoolBusy:
+        raise hash_pool_busy_exception()
     user_data = user_in.dict(exclude={"password"})
     user_data["hashed_password"] = hashed_password
     user_data["role"] = "student"
     user_data["_id"] = str(uuid.uuid4())
-    new_user = await db.users.insert_one(user_data)
+    try:
+        new_user = await db.users.insert_one(user_data)
+    except DuplicateKeyError:
+        # Параллельная регистрация того же email прошла проверку выше раньше нас; решает индекс email_unique
+        raise email_taken_exception()
     created_user = await db.users.find_one({"_id": new_user.inserted_id})
-    access_token = create_access_token(data={"sub": str(created_user["_id"])})
-    refresh_token = create_refresh_token(data={"sub": str(created_user["_id"])})
-    return {"access_token": access_token, "refresh_token": refresh_token}
+    return await issue_tokens(str(created_user["_id"]))
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(background_tasks: BackgroundTasks, form_data: OAuth2PasswordRequestForm = Depends()):
     user = await db.users.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    try:
+        verified = bool(user) and await password_hasher.verify(form_data.password, user["hashed_password"])
+    except HashPoolBusy:
+        raise hash_pool_busy_exception()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": str(user["_id"])})
-    refresh_token = create_refresh_token(data={"sub": str(user["_id"])})
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    if settings.password_rehash_on_login and password_hasher.needs_rehash(user["hashed_password"]):
+        background_tasks.add_task(rehash_password, user["_id"], form_data.password, user["hashed_password"])
+    return await issue_tokens(str(user["_id"]))
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshRequest):
+    # Без bcrypt: проверка подписи и одно атомарное обновление семейства токенов
+    try:
+        return await rotate(body.refresh_token)
+    except RefreshTokenInvalid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Недействительный refresh-токен",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 
 @router.get("/users/me", response_model=User)
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+from typing import List, Set
+
+from booking_index import Booking
+from db import db
+from recurrence import occurrences_between, span_filter
+from timeutils import naive_utc
+
+
+def overlap_filter(start_time: datetime, end_time: datetime) -> dict:
+    # Два полуинтервала [a, b) и [c, d) пересекаются тогда и только тогда, когда a < d и b > c
+    return {
+        "start_time": {"$lt": end_time},
+        "end_time": {"$gt": start_time},
+    }
+
+
+async def find_busy_room_ids(start_time: datetime, end_time: datetime) -> Set[str]:
+    """
+    Return ids of rooms that have an approved booking overlapping the window.
+    One aggregation for all rooms instead of one query per room.
+    """
+    pipeline = [
+        {
+            "$match": {
+                "status": "approved",
+                "location.room_id": {"$exists": True},
+                **overlap_filter(start_time, end_time),
+            }
+        },
+        {"$group": {"_id": "$location.room_id"}},
+    ]
+    # Первое вхождение серии совпадает с её start_time/end_time, остальные проверяются в памяти
+    series_query = {
+        "status": "approved",
+        "location.room_id": {"$exists": True},
+        "rrule": {"$exists": True},
+        "start_time": {"$lt": end_time},
+        "series_end": {"$gt": start_time},
+    }
+    busy, series = await asyncio.gather(
+        db.applications.aggregate(pipeline).to_list(None),
+        db.applications.find(series_query, {"start_time": 1, "end_time": 1, "rrule": 1, "location.room_id": 1}).to_list(None),
+    )
+    busy_room_ids = {doc["_id"] for doc in busy}
+    start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+    for application in series:
+        room_id = application["location"]["room_id"]
+        if room_id not in busy_room_ids and any(
+            start < end_time and end > start_time
+            for start, end in occurrences_between(application, start_time, end_time)
+        ):
+            busy_room_ids.add(room_id)
+    return busy_room_ids
+
+
+async def find_bookings(room_id: str, start_time: datetime, end_time: datetime) -> List[Booking]:
+    """
+    Approved bookings of one room starting in the window, read from Mongo; serves
+    availability while the in-memory booking index is not loaded.
+    """
+    applications = await db.applications.find(
+        {"status": "approved", "location.room_id": room_id, **span_filter(start_time, end_time)},
+        {"title": 1, "start_time": 1, "end_time": 1, "rrule": 1},
+    ).to_list(None)
+    bookings = [
+        Booking(start, end, str(application["_id"]), application.get("title", ""))
+        for application in applications
+        for start, end in occurrences_between(application, start_time, end_time)
+        if start_time <= start < end_time
+    ]
+    bookings.sort()
+    return bookings
@@ -0,0 +1,135 @@
+"""
+Compare the old per-room availability loop with the batched aggregation and with
+rooms read from the in-memory catalogue.
+
+    python -m benchmarks.available_rooms --rooms 300 --bookings 5000
+
+Seeds a scratch database (dropped afterwards) on MONGO_URI.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import availability
+from models import Room
+from room_catalog import room_catalog
+
+
+async def legacy_available_rooms(db, start_time, end_time, capacity=None):
+    query = {}
+    if capacity:
+        query["capacity"] = {"$gte": capacity}
+    all_rooms = await db.rooms.find(query).to_list(1000)
+    available_rooms = []
+    for room_data in all_rooms:
+        room = Room(**room_data)
+        conflicting_applications = await db.applications.find({
+            "location.room_id": room.id,
+            "status": "approved",
+            "$or": [
+                {"start_time": {"$lt": end_time}, "end_time": {"$gt": start_time}},
+                {"start_time": {"$gte": start_time, "$lt": end_time}},
+                {"end_time": {"$gt": start_time, "$lte": end_time}},
+            ],
+        }).to_list(1)
+        if not conflicting_applications:
+            available_rooms.append(room)
+    return available_rooms
+
+
+async def batched_available_rooms(db, start_time, end_time, capacity=None):
+    query = {}
+    if capacity:
+        query["capacity"] = {"$gte": capacity}
+    all_rooms, busy_room_ids = await asyncio.gather(
+        db.rooms.find(query).to_list(1000),
+        availability.find_busy_room_ids(start_time, end_time),
+    )
+    rooms = [Room(**room_data) for room_data in all_rooms]
+    return [room for room in rooms if room.id not in busy_room_ids]
+
+
+async def catalog_available_rooms(db, start_time, end_time, capacity=None):
+    # Комнаты из каталога в памяти, запрос только за занятыми
+    rooms = room_catalog.with_capacity(capacity) if capacity else room_catalog.all()
+    busy_room_ids = await availability.find_busy_room_ids(start_time, end_time)
+    return [room for room in rooms if room.id not in busy_room_ids]
+
+
+async def seed(db, rooms, bookings):
+    base = datetime(2025, 9, 1, 8)
+    await db.rooms.insert_many([
+        {"_id": f"room-{i}", "name": str(100 + i), "capacity": random.randint(10, 200), "tower": random.choice("FB")}
+        for i in range(rooms)
+    ])
+    docs = []
+    for i in range(bookings):
+        start = base + timedelta(days=random.randint(0, 90), minutes=15 * random.randint(0, 48))
+        docs.append({
+            "_id": f"app-{i}",
+            "title": f"Event {i}",
+            "status": random.choice(["approved", "approved", "pending", "rejected"]),
+            "start_time": start,
+            "end_time": start + timedelta(minutes=15 * random.randint(2, 12)),
+            "location": {"type": "dukat", "room_id": f"room-{random.randrange(rooms)}"},
+        })
+    await db.applications.insert_many(docs)
+    await db.applications.create_index([("status", 1), ("location.room_id", 1), ("start_time", 1)])
+    return base
+
+
+async def timed(fn, *args, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, samples
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.mongo_uri)
+    db = client[f"bench_available_rooms_{os.getpid()}"]
+    availability.db = db
+    try:
+        base = await seed(db, args.rooms, args.bookings)
+        room_catalog.load(await db.rooms.find({}).to_list(None))
+        windows = [
+            (base + timedelta(days=d, hours=h), base + timedelta(days=d, hours=h + 2))
+            for d, h in ((1, 1), (10, 3), (45, 5))
+        ]
+        for start_time, end_time in windows:
+            legacy, legacy_ms = await timed(legacy_available_rooms, db, start_time, end_time, repeat=args.repeat)
+            batched, batched_ms = await timed(batched_available_rooms, db, start_time, end_time, repeat=args.repeat)
+            catalog, catalog_ms = await timed(catalog_available_rooms, db, start_time, end_time, repeat=args.repeat)
+            assert [r.id for r in legacy] == [r.id for r in batched] == [r.id for r in catalog], "results differ"
+            print(
+                f"{start_time:%Y-%m-%d %H:%M}  rooms={len(batched):4d}  "
+                f"legacy p50={statistics.median(legacy_ms):8.2f}ms  "
+                f"batched p50={statistics.median(batched_ms):8.2f}ms  "
+                f"x{statistics.median(legacy_ms) / statistics.median(batched_ms):.1f}  "
+                f"catalog p50={statistics.median(catalog_ms):8.2f}ms  "
+                f"x{statistics.median(legacy_ms) / statistics.median(catalog_ms):.1f}"
+            )
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--rooms", type=int, default=300)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
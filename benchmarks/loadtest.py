@@ -0,0 +1,294 @@
+"""
+Load test of the main endpoints against a local mongod or an in-memory stand-in.
+
+    python -m benchmarks.loadtest --mongo-uri mongodb://localhost:27017 --save /tmp/baseline.json
+    python -m benchmarks.loadtest --mongo-uri mongodb://localhost:27017 --compare /tmp/baseline.json
+
+The app runs in-process behind httpx's ASGI transport, so results measure the
+application and database, not the network. --compare exits with status 1 when
+any scenario's p95 or throughput regresses past --tolerance. Numbers depend on the
+machine and the database, so no baseline is committed: save one on the machine that
+compares against it. --in-memory (mongomock) checks that the scenarios run, its
+timings are not meaningful.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("MONGO_URI", "MONGO_DATABASE_NAME"):
+    os.environ.setdefault(name, "benchmark")
+# aiogram проверяет формат токена при создании бота в lifespan
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:benchmark")
+# Все виртуальные пользователи приходят с одного адреса — лимитер измерял бы сам себя
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+PASSWORD = "benchmark-password"
+BASE_TIME = datetime(2025, 9, 1, 8)
+
+
+def connect(args):
+    """Point the app's database handle at the benchmark database."""
+    import db as db_module
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(args.mongo_uri)
+    db_module.settings.mongo_database_name = args.database
+    db_module.db.connect(client)
+    return client, db_module.db
+
+
+async def seed(database, args):
+    from hashing import pwd_context
+
+    await database.users.delete_many({})
+    await database.rooms.delete_many({})
+    await database.applications.delete_many({})
+
+    hashed_password = pwd_context.hash(PASSWORD)
+    users = [
+        {"_id": f"student-{i}", "full_name": f"Student {i}", "email": f"student{i}@example.com",
+         "hashed_password": hashed_password, "role": "student"}
+        for i in range(args.users)
+    ]
+    users.append({"_id": "curator", "full_name": "Curator", "email": "curator@example.com",
+                  "hashed_password": hashed_password, "role": "curator"})
+    await database.users.insert_many(users)
+
+    rooms = [
+        {"_id": f"room-{i}", "name": str(100 + i), "capacity": random.randint(10, 200), "tower": random.choice("FB")}
+        for i in range(args.rooms)
+    ]
+    await database.rooms.insert_many(rooms)
+
+    applications = []
+    for i in range(args.applications):
+        room = random.choice(rooms)
+        start = BASE_TIME + timedelta(days=random.randint(0, 120), minutes=15 * random.randint(0, 48))
+        applications.append({
+            "_id": str(uuid.uuid4()),
+            "title": f"Event {i}",
+            "description": "Описание мероприятия. " * 10,
+            "start_time": start,
+            "end_time": start + timedelta(minutes=15 * random.randint(2, 12)),
+            "organizer_id": random.choice(users)["_id"],
+            "organizer_name": "Organizer",
+            "expected_participants": random.randint(5, 150),
+            "needs": "Проектор",
+            "status": random.choices(["approved", "pending", "rejected"], weights=[6, 3, 1])[0],
+            "curator_comment": None,
+            "image_url": None,
+            "event_type": "OFFLINE",
+            "location": {"type": "dukat", "tower": room["tower"], "room_number": room["name"], "room_id": room["_id"]},
+        })
+    await database.applications.insert_many(applications)
+    return [room["_id"] for room in rooms], [a["_id"] for a in applications if a["status"] == "pending"]
+
+
+async def login(client, email):
+    response = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()
+
+
+def bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def scenarios(room_ids, pending_ids, args):
+    def window():
+        start = BASE_TIME + timedelta(days=random.randint(0, 120), hours=random.randint(0, 10))
+        return start, start + timedelta(hours=2)
+
+    async def auth_login(client, tokens):
+        return await client.post(
+            "/auth/login",
+            data={"username": f"student{random.randrange(args.users)}@example.com", "password": PASSWORD},
+        )
+
+    async def auth_refresh(client, tokens):
+        # Токены ротируются, поэтому у каждого запроса своё семейство из общего пула
+        refresh_tokens = tokens["refresh"]
+        refresh_token = refresh_tokens.pop()
+        response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+        refresh_tokens.insert(0, response.json()["refresh_token"] if response.status_code == 200 else refresh_token)
+        return response
+
+    async def rooms_available(client, tokens):
+        start, end = window()
+        return await client.get(
+            "/rooms/available",
+            params={"start_time": start.isoformat(), "end_time": end.isoformat()},
+            headers=tokens["student"],
+        )
+
+    async def room_availability(client, tokens):
+        start, _ = window()
+        return await client.get(
+            f"/rooms/{random.choice(room_ids)}/availability",
+            params={"date": start.date().isoformat()},
+            headers=tokens["student"],
+        )
+
+    async def applications_all(client, tokens):
+        return await client.get("/applications/all")
+
+    async def events_list(client, tokens):
+        start, _ = window()
+        return await client.get("/events/", params={"start_date": start.isoformat()})
+
+    async def moderate(client, tokens):
+        return await client.patch(
+            f"/applications/one/{random.choice(pending_ids)}/moderate",
+            json={"status": random.choice(["approved", "rejected"])},
+            headers=tokens["curator"],
+        )
+
+    # Веса примерно повторяют продакшн: ленты читаются намного чаще всего остального
+    return {
+        "login": (auth_login, 1),
+        "refresh": (auth_refresh, 1),
+        "rooms_available": (rooms_available, 4),
+        "room_availability": (room_availability, 4),
+        "applications_all": (applications_all, 10),
+        "events": (events_list, 10),
+        "moderate": (moderate, 1),
+    }
+
+
+async def drive(client, tokens, plan, duration, concurrency):
+    names = list(plan)
+    weights = [plan[name][1] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user():
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights=weights)[0]
+            started = time.perf_counter()
+            response = await plan[name][0](client, tokens)
+            latencies[name].append(time.perf_counter() - started)
+            if response.status_code >= 500 or response.status_code in (401, 403, 422):
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(samples, q):
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1] if len(samples) > 1 else samples[0]
+
+
+def summarize(latencies, errors, elapsed):
+    report = {}
+    for name, samples in sorted(latencies.items()):
+        report[name] = {
+            "requests": len(samples),
+            "errors": errors[name],
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        }
+    return report
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name, current in report.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {previous['rps']:.1f} -> {current['rps']:.1f}")
+    return regressions
+
+
+async def main(args):
+    random.seed(args.seed)
+    mongo_client, database = connect(args)
+    room_ids, pending_ids = await seed(database, args)
+
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            tokens = {
+                "student": bearer(await login(client, "student0@example.com")),
+                "curator": bearer(await login(client, "curator@example.com")),
+                "refresh": [
+                    (await login(client, f"student{i % args.users}@example.com"))["refresh_token"]
+                    for i in range(args.concurrency)
+                ],
+            }
+            plan = scenarios(room_ids, pending_ids, args)
+            await drive(client, tokens, plan, args.warmup, args.concurrency)
+            latencies, errors, elapsed = await drive(client, tokens, plan, args.duration, args.concurrency)
+
+        if not args.in_memory:
+            await mongo_client.drop_database(args.database)
+
+    report = summarize(latencies, errors, elapsed)
+    print(f"{'scenario':20s} {'reqs':>7s} {'err':>5s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for name, row in report.items():
+        print(
+            f"{name:20s} {row['requests']:7d} {row['errors']:5d} {row['rps']:8.1f} "
+            f"{row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f}"
+        )
+
+    result = {
+        "params": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "mongo_uri")},
+        "scenarios": report,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    target.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument("--database", default="univent_loadtest")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--applications", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write the report as a baseline JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
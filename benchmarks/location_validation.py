@@ -0,0 +1,106 @@
+"""
+Validation throughput of ApplicationCreate: the former v1 dict validator vs the
+discriminated location union checked against the in-memory room catalogue.
+
+    python -m benchmarks.location_validation --rooms 300 --items 10000
+"""
+import argparse
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("MONGO_URI", "MONGO_DATABASE_NAME", "TELEGRAM_TOKEN"):
+    os.environ.setdefault(name, "benchmark")
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, validator
+
+from models import ApplicationCreate, EventType
+from room_catalog import room_catalog
+
+
+class LegacyApplicationCreate(BaseModel):
+    # Копия прежней модели с v1-валидатором, для сравнения
+    title: str
+    description: str
+    start_time: datetime
+    end_time: datetime
+    expected_participants: int
+    needs: str
+    image_url: str | None = None
+    event_type: EventType
+    location: dict | None = None
+
+    model_config = ConfigDict(use_enum_values=True)
+
+    @validator("location", always=True)
+    def validate_location(cls, v, values):
+        event_type = values.get("event_type")
+        if event_type == EventType.ONLINE:
+            if v is not None:
+                raise ValueError("Местоположение не должно быть указано для ОНЛАЙН мероприятия.")
+        elif event_type == EventType.OFFLINE:
+            if v is None:
+                raise ValueError("Местоположение обязательно для ОФФЛАЙН мероприятия.")
+            if "type" not in v or v["type"] not in ["dukat", "custom"]:
+                raise ValueError("Тип местоположения должен быть 'dukat' или 'custom'.")
+            if v["type"] == "dukat":
+                if v.get("tower") not in ["F", "B"] or not v.get("room_number"):
+                    raise ValueError("Неверные данные местоположения Dukat.")
+            elif v["type"] == "custom":
+                if not v.get("address"):
+                    raise ValueError("Адрес обязателен для пользовательского местоположения.")
+        return v
+
+
+def make_rooms(count: int) -> List[dict]:
+    return [
+        {"_id": str(uuid.uuid4()), "tower": "FB"[i % 2], "name": str(100 + i), "capacity": 20 + i % 80}
+        for i in range(count)
+    ]
+
+
+def make_payloads(rooms: List[dict], count: int) -> List[dict]:
+    base = datetime(2025, 9, 1, 9)
+    payloads = []
+    for i in range(count):
+        payload = {
+            "title": f"Встреча клуба #{i}",
+            "description": "Описание мероприятия.",
+            "start_time": (base + timedelta(hours=i)).isoformat(),
+            "end_time": (base + timedelta(hours=i, minutes=90)).isoformat(),
+            "expected_participants": 40,
+            "needs": "Проектор",
+            "event_type": "OFFLINE",
+        }
+        if i % 3 == 2:
+            payload["location"] = {"type": "custom", "address": "ул. Ломоносова, 9"}
+        else:
+            room = rooms[i % len(rooms)]
+            payload["location"] = {"type": "dukat", "tower": room["tower"], "room_number": room["name"]}
+        payloads.append(payload)
+    return payloads
+
+
+def main(args):
+    rooms = make_rooms(args.rooms)
+    room_catalog.load(rooms)
+    payloads = make_payloads(rooms, args.items)
+    baseline = None
+    for name, model in (("v1 dict validator", LegacyApplicationCreate), ("v2 location union", ApplicationCreate)):
+        adapter = TypeAdapter(List[model])
+        best = min(timeit.repeat(lambda: adapter.validate_python(payloads), number=args.number, repeat=5))
+        rate = args.items * args.number / best
+        baseline = baseline or rate
+        print(f"{name:20s} {rate:12,.0f} validations/s   x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=300)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--number", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+"""
+Concurrent login throughput: bcrypt inline on the event loop vs the worker pool.
+
+    python -m benchmarks.login_concurrency --logins 64 --concurrency 16
+
+While logins run, a ticker task measures how long the event loop is blocked,
+which is what every other request would wait for.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("MONGO_URI", "MONGO_DATABASE_NAME", "TELEGRAM_TOKEN"):
+    os.environ.setdefault(name, "benchmark")
+
+from hashing import PasswordHasher, pwd_context
+
+PASSWORD = "correct horse battery staple"
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    interval = 0.005
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(verify, hashed, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            assert await verify(PASSWORD, hashed)
+
+    stop, lags = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+    return logins / elapsed, max(lags, default=0.0) * 1000
+
+
+async def main(args):
+    hashed = pwd_context.hash(PASSWORD)
+
+    async def inline_verify(password, hashed_password):
+        return pwd_context.verify(password, hashed_password)
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.logins)
+    results = {
+        "inline": await run(inline_verify, hashed, args.logins, args.concurrency),
+        f"pool({args.workers})": await run(hasher.verify, hashed, args.logins, args.concurrency),
+    }
+    hasher.shutdown()
+    for name, (throughput, max_lag_ms) in results.items():
+        print(f"{name:10s} {throughput:7.1f} logins/s   max event-loop stall {max_lag_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    asyncio.run(main(parser.parse_args()))
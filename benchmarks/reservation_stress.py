@@ -0,0 +1,127 @@
+"""
+Concurrent approvals of overlapping bookings: journal claims vs a global lock.
+
+    python -m benchmarks.reservation_stress --approvals 2000 --rooms 5 --concurrency 64
+
+Needs a real mongod (MONGO_URI). Both strategies approve the same random
+workload; afterwards every room is checked for overlapping approved bookings.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("MONGO_URI", "MONGO_DATABASE_NAME", "TELEGRAM_TOKEN"):
+    os.environ.setdefault(name, "benchmark")
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import reservations
+from core.config import settings
+from db import db
+
+BASE_TIME = datetime(2025, 9, 1, 8)
+
+
+def workload(args):
+    applications = []
+    for _ in range(args.approvals):
+        start = BASE_TIME + timedelta(days=random.randrange(args.days), minutes=15 * random.randrange(48))
+        applications.append({
+            "_id": str(uuid.uuid4()),
+            "status": "pending",
+            "start_time": start,
+            "end_time": start + timedelta(minutes=15 * random.randint(1, 8)),
+            "location": {"room_id": f"room-{random.randrange(args.rooms)}"},
+        })
+    return applications
+
+
+async def approve_with_journal(application):
+    room_id = application["location"]["room_id"]
+    if not await reservations.claim(application["_id"], room_id, application["start_time"], application["end_time"]):
+        return False
+    await db.applications.update_one({"_id": application["_id"]}, {"$set": {"status": "approved"}})
+    return True
+
+
+def approve_with_lock(lock):
+    async def approve(application):
+        async with lock:
+            conflict = await db.applications.find_one({
+                "status": "approved",
+                "location.room_id": application["location"]["room_id"],
+                "start_time": {"$lt": application["end_time"]},
+                "end_time": {"$gt": application["start_time"]},
+            })
+            if conflict:
+                return False
+            await db.applications.update_one({"_id": application["_id"]}, {"$set": {"status": "approved"}})
+            return True
+
+    return approve
+
+
+async def double_bookings():
+    by_room = defaultdict(list)
+    async for application in db.applications.find({"status": "approved"}):
+        by_room[application["location"]["room_id"]].append((application["start_time"], application["end_time"]))
+    overlaps = 0
+    for intervals in by_room.values():
+        intervals.sort()
+        latest_end = datetime.min
+        for start, end in intervals:
+            overlaps += start < latest_end
+            latest_end = max(latest_end, end)
+    return overlaps
+
+
+async def run(name, approve, applications, concurrency):
+    await db.applications.delete_many({})
+    await db.room_reservations.delete_many({})
+    await db.applications.insert_many([dict(a) for a in applications])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(application):
+        async with semaphore:
+            return await approve(application)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(a) for a in applications))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:10s} {len(applications) / elapsed:8.1f} approvals/s   "
+        f"approved={sum(results):5d}  double bookings={await double_bookings()}"
+    )
+
+
+async def main(args):
+    random.seed(args.seed)
+    client = AsyncIOMotorClient(args.mongo_uri)
+    settings.mongo_database_name = f"bench_reservations_{os.getpid()}"
+    db.connect(client)
+    await db.applications.create_index([("status", 1), ("location.room_id", 1), ("start_time", 1), ("end_time", 1)])
+    applications = workload(args)
+    try:
+        await run("journal", approve_with_journal, applications, args.concurrency)
+        await run("global lock", approve_with_lock(asyncio.Lock()), applications, args.concurrency)
+    finally:
+        await client.drop_database(settings.mongo_database_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--approvals", type=int, default=2000)
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
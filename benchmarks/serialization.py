@@ -0,0 +1,103 @@
+"""
+Serialization cost of a feed page: stdlib path vs pydantic vs trusted orjson,
+and the same for the summary fieldset the list endpoints return by default.
+
+    python -m benchmarks.serialization --items 1000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("MONGO_URI", "MONGO_DATABASE_NAME", "TELEGRAM_TOKEN"):
+    os.environ.setdefault(name, "benchmark")
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import responses
+from models import EventApplication, EventApplicationSummary
+
+
+def make_documents(count: int) -> List[dict]:
+    base = datetime(2025, 9, 1, 9)
+    return [
+        {
+            "_id": str(uuid.uuid4()),
+            "title": f"Встреча клуба #{i}",
+            "description": "Описание мероприятия. " * 20,
+            "start_time": base + timedelta(hours=i),
+            "end_time": base + timedelta(hours=i, minutes=90),
+            "organizer_id": str(uuid.uuid4()),
+            "organizer_name": "Иван Иванов",
+            "expected_participants": 40,
+            "needs": "Проектор, микрофон, 40 стульев",
+            "status": "approved",
+            "curator_comment": None,
+            "image_url": None,
+            "event_type": "OFFLINE",
+            "location": {"type": "dukat", "tower": "F", "room_number": "501", "room_id": str(uuid.uuid4())},
+        }
+        for i in range(count)
+    ]
+
+
+def fastapi_default(documents):
+    # То, что делает FastAPI с response_model + JSONResponse
+    adapter = TypeAdapter(List[EventApplication])
+    validated = adapter.validate_python(documents)
+    content = jsonable_encoder(adapter.dump_python(validated, by_alias=True, mode="json"))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def pydantic_validated(documents):
+    responses.settings.fast_responses = False
+    return responses.render_json(EventApplication, documents, trusted=True)
+
+
+def orjson_trusted(documents):
+    responses.settings.fast_responses = True
+    return responses.render_json(EventApplication, documents, trusted=True)
+
+
+def summary_validated(documents):
+    responses.settings.fast_responses = False
+    return responses.render_json(EventApplicationSummary, documents, trusted=True)
+
+
+def summary_trusted(documents):
+    responses.settings.fast_responses = True
+    return responses.render_json(EventApplicationSummary, documents, trusted=True)
+
+
+def main(args):
+    documents = make_documents(args.items)
+    assert orjson.loads(pydantic_validated(documents)) == orjson.loads(orjson_trusted(documents))
+    # Проекция в Mongo отдаёт только поля сводки
+    summary_keys = {field.alias or name for name, field in EventApplicationSummary.model_fields.items()}
+    summary_documents = [{key: value for key, value in document.items() if key in summary_keys} for document in documents]
+    baseline = None
+    for name, fn, page in (
+        ("fastapi default", fastapi_default, documents),
+        ("pydantic dump_json", pydantic_validated, documents),
+        ("orjson trusted", orjson_trusted, documents),
+        ("summary pydantic", summary_validated, summary_documents),
+        ("summary orjson", summary_trusted, summary_documents),
+    ):
+        best = min(timeit.repeat(lambda: fn(page), number=args.number, repeat=5)) / args.number * 1000
+        baseline = baseline or best
+        size = len(fn(page)) / 1024
+        print(f"{name:20s} {best:8.2f} ms/page   x{baseline / best:.1f}   {size:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db import db
+from recurrence import IntervalSet, occurrences
+from room_catalog import CHANGE_STREAMS_UNSUPPORTED
+from timeutils import naive_utc
+
+logger = logging.getLogger(__name__)
+
+
+class Booking(NamedTuple):
+    start_time: datetime
+    end_time: datetime
+    application_id: str
+    title: str
+
+
+class _RoomBookings(IntervalSet):
+    """IntervalSet of one room that also keeps the bookings, in start order."""
+
+    __slots__ = ("bookings",)
+
+    def __init__(self):
+        super().__init__()
+        self.bookings: List[Booking] = []  # параллельно starts; ends отсортированы независимо
+
+    def add_booking(self, booking: Booking):
+        i = bisect_right(self.starts, booking.start_time)
+        self.bookings.insert(i, booking)
+        self.starts.insert(i, booking.start_time)
+        insort(self.ends, booking.end_time)
+
+    def remove_booking(self, booking: Booking):
+        i = bisect_left(self.starts, booking.start_time)
+        while self.bookings[i] != booking:
+            i += 1
+        del self.bookings[i]
+        del self.starts[i]
+        del self.ends[bisect_left(self.ends, booking.end_time)]
+
+
+def current_horizon() -> datetime:
+    # Начало текущих суток UTC: сегодняшняя доступность целиком отвечается из индекса
+    return datetime.combine(datetime.now(timezone.utc).date(), time.min)
+
+
+class BookingIndex:
+    """
+    In-process interval index of approved bookings, keyed by location.room_id.
+    Answers availability questions in O(log n) without a database query.
+
+    Only bookings ending after the horizon (start of the day of the last rebuild) are
+    kept; covers() tells whether a window can be answered from the index at all.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.horizon: Optional[datetime] = None  # None — без отсечения, вся история
+        self._rooms: Dict[str, _RoomBookings] = {}
+        self._by_application: Dict[str, Tuple[str, Tuple[Booking, ...]]] = {}
+
+    def _entry(self, application: dict) -> Optional[Tuple[str, Tuple[Booking, ...]]]:
+        location = application.get("location") or {}
+        room_id = location.get("room_id")
+        if application.get("status") != "approved" or not room_id:
+            return None
+        # У серии в индексе лежат вхождения после горизонта — их число ограничено правилом
+        bookings = tuple(
+            Booking(start_time, end_time, str(application["_id"]), application.get("title", ""))
+            for start_time, end_time in occurrences(application, self.horizon)
+            if self.horizon is None or end_time > self.horizon
+        )
+        return (room_id, bookings) if bookings else None
+
+    def _discard(self, application_id: str):
+        entry = self._by_application.pop(application_id, None)
+        if entry is not None:
+            room_id, bookings = entry
+            for booking in bookings:
+                self._rooms[room_id].remove_booking(booking)
+
+    def apply(self, application: dict):
+        """Sync the index with the current state of one application document."""
+        application_id = str(application["_id"])
+        self._discard(application_id)
+        entry = self._entry(application)
+        if entry is not None:
+            room_id, bookings = entry
+            room = self._rooms.setdefault(room_id, _RoomBookings())
+            for booking in bookings:
+                room.add_booking(booking)
+            self._by_application[application_id] = entry
+
+    def _apply_change(self, change: dict):
+        document = change.get("fullDocument")
+        if document is None:
+            # delete, или документ удалён раньше, чем событие прочитано
+            self._discard(str(change["documentKey"]["_id"]))
+        else:
+            self.apply(document)
+
+    def load(self, applications, horizon: Optional[datetime] = None):
+        self.horizon = horizon
+        self._rooms = {}
+        self._by_application = {}
+        for application in applications:
+            self.apply(application)
+        self.loaded = True
+
+    async def _fetch(self, horizon: Optional[datetime]) -> List[dict]:
+        query = {"status": "approved", "location.room_id": {"$exists": True}}
+        if horizon is not None:
+            query["$or"] = [{"end_time": {"$gt": horizon}}, {"rrule": {"$exists": True}, "series_end": {"$gt": horizon}}]
+        return await db.applications.find(
+            query,
+            {"title": 1, "start_time": 1, "end_time": 1, "rrule": 1, "status": 1, "location.room_id": 1},
+        ).to_list(None)
+
+    async def rebuild(self):
+        horizon = current_horizon()
+        self.load(await self._fetch(horizon), horizon)
+
+    async def refresh_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Booking index refresh failed")
+
+    async def follow(self, interval: float, change_stream: bool = True):
+        """
+        Keep the index current across workers. Each worker applies its own moderations
+        at once; those of other workers arrive through an applications change stream
+        within its latency, or, where change streams are unavailable (standalone mongod),
+        with the next full rebuild — up to interval seconds late.
+        """
+        while change_stream:
+            try:
+                async with db.applications.watch(full_document="updateLookup") as stream:
+                    # Изменения между последней загрузкой и открытием потока не потеряются
+                    await self.rebuild()
+                    async for change in stream:
+                        self._apply_change(change)
+            except OperationFailure as exc:
+                if exc.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Application change streams unsupported, rebuilding every %ss", interval)
+                    break
+                logger.warning("Application change stream failed, reopening: %s", exc)
+                await asyncio.sleep(min(interval, 5))
+            except PyMongoError:
+                logger.exception("Application change stream failed, reopening")
+                await asyncio.sleep(min(interval, 5))
+        await self.refresh_periodically(interval)
+
+    async def check(self) -> dict:
+        """Compare the index with Mongo; empty lists mean the index is consistent."""
+        expected = {}
+        for application in await self._fetch(self.horizon):
+            entry = self._entry(application)
+            if entry is not None:
+                expected[str(application["_id"])] = entry
+        return {
+            "missing": sorted(expected.keys() - self._by_application.keys()),
+            "extra": sorted(self._by_application.keys() - expected.keys()),
+            "stale": sorted(
+                application_id
+                for application_id in expected.keys() & self._by_application.keys()
+                if expected[application_id] != self._by_application[application_id]
+            ),
+        }
+
+    def covers(self, start_time: datetime) -> bool:
+        """Whether windows starting at start_time can be answered from the index."""
+        return self.loaded and (self.horizon is None or naive_utc(start_time) >= self.horizon)
+
+    def is_free(
+        self,
+        room_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        exclude_id: Optional[str] = None,
+    ) -> bool:
+        room = self._rooms.get(room_id)
+        if room is None:
+            return True
+        start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+        overlapping = room.count_overlapping(start_time, end_time)
+        excluded = self._by_application.get(exclude_id) if exclude_id else None
+        if excluded is not None and excluded[0] == room_id:
+            overlapping -= sum(
+                1 for booking in excluded[1] if booking.start_time < end_time and booking.end_time > start_time
+            )
+        return overlapping == 0
+
+    def busy_room_ids(self, start_time: datetime, end_time: datetime) -> Set[str]:
+        start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+        return {
+            room_id
+            for room_id, room in self._rooms.items()
+            if room.count_overlapping(start_time, end_time)
+        }
+
+    def bookings_on(self, room_id: str, day: date) -> List[Booking]:
+        """Bookings of the room that start on the given day."""
+        room = self._rooms.get(room_id)
+        if room is None:
+            return []
+        start_of_day = datetime.combine(day, time.min)
+        end_of_day = start_of_day + timedelta(days=1)
+        return room.bookings[bisect_left(room.starts, start_of_day):bisect_left(room.starts, end_of_day)]
+
+
+booking_index = BookingIndex()
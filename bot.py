@@ -1,16 +1,37 @@
 import asyncio
 from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.filters.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from security import get_password_hash
+from bot_storage import MongoFSMStorage
+from hashing import HashPoolBusy, password_hasher
 from core.config import settings
-from db import collection
+from db import db
 
-bot = Bot(token=settings.telegram_token)
-dp = Dispatcher(storage=MemoryStorage())  # FSM работает через MemoryStorage
+# Состояние диалогов в Mongo: переживает перезапуск и общее для нескольких процессов бота
+dp = Dispatcher(storage=MongoFSMStorage())
+_bot: Bot | None = None
+
+
+def get_bot() -> Bot:
+    """Create the Bot on first use, inside the process and event loop that will use it."""
+    global _bot
+    if _bot is None:
+        # TELEGRAM_API_URL позволяет направить бота на локальный Bot API сервер или фейк для тестов
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url)) if settings.telegram_api_url else None
+        _bot = Bot(token=settings.telegram_token, session=session)
+    return _bot
+
+
+async def close_bot():
+    global _bot
+    if _bot is not None:
+        await _bot.session.close()
+        _bot = None
 
 
 class Regist(StatesGroup):
@@ -29,41 +50,57 @@ async def reg_user(message: types.Message, state: FSMContext):
     await state.set_state(Regist.email)
 
 
+@dp.message(Command("stop"))
+async def unlink_user(message: types.Message, state: FSMContext):
+    await state.clear()
+    result = await db.users.update_one({"user_tg_id": message.from_user.id}, {"$unset": {"user_tg_id": ""}})
+    if result.modified_count:
+        await message.answer("Оповещения отключены")
+    else:
+        await message.answer("Этот аккаунт Telegram не привязан")
+
+
 @dp.message(Regist.email)
 async def set_email(message: types.Message, state: FSMContext):
-    await state.update_data(email=message.text)
+    await state.update_data(email=(message.text or "").strip())
     await message.answer("Хорошо, теперь пароль")
     await state.set_state(Regist.password)
 
 
+async def link_telegram(user_id: str, tg_id: int):
+    """Point the Telegram account at one user: a tg id can be linked to a single account."""
+    await db.users.update_many(
+        {"user_tg_id": tg_id, "_id": {"$ne": user_id}},
+        {"$unset": {"user_tg_id": ""}},
+    )
+    await db.users.update_one({"_id": user_id}, {"$set": {"user_tg_id": tg_id}})
+
+
 @dp.message(Regist.password)
 async def set_password(message: types.Message, state: FSMContext):
-    await state.update_data(password=message.text)
+    # Пароль не попадает в состояние FSM, а сообщение с ним удаляем из чата
+    password = message.text or ""
+    try:
+        await message.delete()
+    except TelegramBadRequest:
+        pass
     data = await state.get_data()
-    curr_email = data.get("email")
-    password = data.get("password")  # 32
-    user = collection.find_one(
-        {"email": curr_email, "hashed_password": get_password_hash(password)})
-    if user:
-        await message.answer(f"Теперь тебе будут приходить оповещения {message.from_user.id}")
-        collection.update_one(
-            {"email": curr_email},
-            {"$set": {"user_tg_id": message.from_user.id}}
-        )
-        await state.clear()
-    else:
-        await message.answer(f'Пользователя с такой почтой или паролем не существует')
-
-
-async def send_notif(status, user_id):
-    if status == 'approved':
-        await bot.send_message(user_id, text=f'Событие "_" в аудитории _ разрешено для проведения')
-    elif status == 'not_approved':
-        await bot.send_message(user_id, text=f'Событие "_" в аудитории _ не может быть проведено')
+    user = await db.users.find_one({"email": data.get("email")}, {"hashed_password": 1})
+    try:
+        verified = bool(user) and await password_hasher.verify(password, user["hashed_password"])
+    except HashPoolBusy:
+        await message.answer("Сервер перегружен, отправь пароль ещё раз чуть позже")
+        return
+    if not verified:
+        await message.answer("Пользователя с такой почтой или паролем не существует")
+        return
+    await link_telegram(user["_id"], message.from_user.id)
+    await state.clear()
+    await message.answer(f"Теперь тебе будут приходить оповещения {message.from_user.id}")
 
 
 async def main():
-    await dp.start_polling(bot)
+    await dp.start_polling(get_bot())
 
 if __name__ == "__main__":
     asyncio.run(main())
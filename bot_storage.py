@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from pymongo import ReturnDocument
+
+from db import db
+
+
+class MongoFSMStorage(BaseStorage):
+    """
+    FSM storage in the bot_fsm collection: one document per conversation key, so state
+    survives restarts and is shared between bot processes. Abandoned conversations are
+    removed by the TTL index on updated_at.
+    """
+
+    def __init__(self, collection_name: str = "bot_fsm", key_builder: Optional[KeyBuilder] = None):
+        self.collection_name = collection_name
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    @property
+    def _collection(self):
+        return db[self.collection_name]
+
+    @staticmethod
+    def _state_name(state: StateType) -> Optional[str]:
+        return state.state if isinstance(state, State) else state
+
+    async def _update(self, key: StorageKey, field: str, value: Any):
+        document_id = self.key_builder.build(key)
+        # Пустое состояние без данных хранить незачем
+        document = await self._collection.find_one_and_update(
+            {"_id": document_id},
+            {"$set": {field: value, "updated_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if not document.get("state") and not document.get("data"):
+            await self._collection.delete_one({"_id": document_id, "updated_at": document["updated_at"]})
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._update(key, "state", self._state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        document = await self._collection.find_one({"_id": self.key_builder.build(key)}, {"state": 1})
+        return document.get("state") if document else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._update(key, "data", dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        document = await self._collection.find_one({"_id": self.key_builder.build(key)}, {"data": 1})
+        return dict(document.get("data") or {}) if document else {}
+
+    async def close(self) -> None:
+        # Соединение принадлежит общему db, его закрывает владелец процесса
+        pass
@@ -0,0 +1,253 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from timeutils import naive_utc
+
+# Импорт и экспорт идут потоком: тело запроса читается по строкам, курсор Mongo
+# выдаёт документы по одному, поэтому память не растёт с размером файла
+
+MAX_LINE_BYTES = 1024 * 1024
+
+CSV_COLUMNS = (
+    "_id",
+    "series_id",
+    "title",
+    "description",
+    "start_time",
+    "end_time",
+    "organizer_name",
+    "expected_participants",
+    "needs",
+    "status",
+    "event_type",
+    "image_url",
+    "location.type",
+    "location.tower",
+    "location.room_number",
+    "location.address",
+)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without reading it whole."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Слишком длинная строка")
+        for line in lines:
+            yield _decode(line)
+    if buffer:
+        yield _decode(buffer)
+
+
+def _decode(line: bytes) -> str:
+    # utf-8-sig снимает BOM, который Excel пишет в начало CSV
+    return line.decode("utf-8-sig", errors="replace").rstrip("\r")
+
+
+async def ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, parsed object or ValueError) for every non-empty line."""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+
+
+def unflatten(row: Dict[str, str]) -> dict:
+    """CSV row with dotted columns ("location.tower") to a nested dict; empty cells are dropped."""
+    record: dict = {}
+    for column, value in row.items():
+        if column is None or value is None or value == "":
+            continue
+        target = record
+        *parents, leaf = column.strip().split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return record
+
+
+async def csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, record dict) for every CSV row; quoted fields may span lines."""
+    header = None
+    pending: List[str] = []
+    pending_bytes = 0
+    open_quote = False
+    number = start = 0
+    async for line in lines:
+        number += 1
+        if not pending:
+            start = number
+        pending.append(line)
+        pending_bytes += len(line.encode())
+        # В RFC 4180 кавычки внутри поля удваиваются, поэтому нечётное число — поле не закрыто
+        open_quote ^= line.count('"') % 2 == 1
+        if open_quote:
+            if pending_bytes > MAX_LINE_BYTES:
+                # Незакрытая кавычка не должна копить остаток файла в памяти
+                yield start, ValueError("Незакрытая кавычка: запись длиннее допустимого")
+                pending, pending_bytes, open_quote = [], 0, False
+            continue
+        row = next(csv.reader(line + "\n" for line in pending), [])
+        pending, pending_bytes = [], 0
+        if not any(cell.strip() for cell in row):
+            continue
+        if header is None:
+            header = [cell.strip() for cell in row]
+            continue
+        yield start, unflatten(dict(zip(header, row)))
+    if pending:
+        yield start, ValueError("Незакрытая кавычка")
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return naive_utc(value).isoformat()
+    return str(value)
+
+
+def csv_header() -> bytes:
+    return _csv_line(CSV_COLUMNS)
+
+
+def _csv_line(cells: Iterable[str]) -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerow(cells)
+    return out.getvalue().encode()
+
+
+def csv_row(document: dict) -> bytes:
+    cells = []
+    for column in CSV_COLUMNS:
+        value: Any = document
+        for part in column.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        cells.append(_format_value(value))
+    return _csv_line(cells)
+
+
+def _ics_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _ics_fold(line: str) -> bytes:
+    # Строки длиннее 75 октетов переносятся, продолжение начинается с пробела
+    data = line.encode()
+    if len(data) <= 75:
+        return data + b"\r\n"
+    parts, current = [], b""
+    for char in line:
+        encoded = char.encode()
+        if len(current) + len(encoded) > (75 if not parts else 74):
+            parts.append(current)
+            current = b""
+        current += encoded
+    parts.append(current)
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def _ics_time(value: datetime) -> str:
+    return naive_utc(value).strftime("%Y%m%dT%H%M%SZ")
+
+
+def ics_header(name: str) -> bytes:
+    return b"".join(
+        _ics_fold(line)
+        for line in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Univent//Events//RU",
+            "CALSCALE:GREGORIAN",
+            f"X-WR-CALNAME:{_ics_escape(name)}",
+        )
+    )
+
+
+def ics_footer() -> bytes:
+    return b"END:VCALENDAR\r\n"
+
+
+def _location_text(location: Optional[dict]) -> Optional[str]:
+    if not location:
+        return None
+    if location.get("type") == "dukat":
+        return f'{location.get("tower", "")}{location.get("room_number", "")}'
+    return location.get("address")
+
+
+def ics_event(document: dict, stamp: datetime) -> bytes:
+    lines = [
+        "BEGIN:VEVENT",
+        f'UID:{document["_id"]}@univent',
+        f"DTSTAMP:{_ics_time(stamp)}",
+        f'DTSTART:{_ics_time(document["start_time"])}',
+        f'DTEND:{_ics_time(document["end_time"])}',
+        f'SUMMARY:{_ics_escape(document.get("title", ""))}',
+    ]
+    if document.get("rrule"):
+        lines.append(f'RRULE:{document["rrule"]}')
+    if document.get("description"):
+        lines.append(f'DESCRIPTION:{_ics_escape(document["description"])}')
+    location = _location_text(document.get("location"))
+    if location:
+        lines.append(f"LOCATION:{_ics_escape(location)}")
+    lines.append("END:VEVENT")
+    return b"".join(_ics_fold(line) for line in lines)
+
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ics": "text/calendar; charset=utf-8"}
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+async def _export_chunks(cursor, format: str, name: str) -> AsyncIterator[bytes]:
+    # Строки копятся в куски по ~64 КБ, чтобы не отправлять по одному send на документ
+    parts: List[bytes] = []
+    size = 0
+    if format == "csv":
+        parts.append(csv_header())
+    else:
+        parts.append(ics_header(name))
+    stamp = datetime.utcnow()
+    async for document in cursor:
+        part = csv_row(document) if format == "csv" else ics_event(document, stamp)
+        parts.append(part)
+        size += len(part)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if format == "ics":
+        parts.append(ics_footer())
+    yield b"".join(parts)
+
+
+def export_response(cursor, format: str, name: str) -> StreamingResponse:
+    """Stream CSV or iCalendar while the Motor cursor yields documents."""
+    return StreamingResponse(
+        _export_chunks(cursor, format, name),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+
+def validation_detail(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f'{".".join(str(part) for part in error["loc"]) or "запись"}: {error["msg"]}' for error in exc.errors()
+        )
+    return str(exc)
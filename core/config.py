@@ -4,7 +4,64 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     mongo_uri: str
     mongo_database_name: str
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 5
+    mongo_max_idle_time_ms: int = 60000
     telegram_token: str
+    telegram_api_url: str | None = None
+
+    host: str = "0.0.0.0"
+    port: int = 8000
+    web_concurrency: int = 1
+    # Адреса или подсети прокси, чьим X-Forwarded-For можно верить. Не "*": тогда клиент сам
+    # выбирает свой адрес в заголовке и обходит лимиты по IP
+    forwarded_allow_ips: str = "127.0.0.1"
+    ensure_indexes_on_startup: bool = True
+    booking_index_refresh_interval: float = 30.0
+    booking_index_change_stream: bool = True
+    room_catalog_refresh_interval: float = 60.0
+    room_catalog_change_stream: bool = True
+
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+    password_rehash_on_login: bool = True
+
+    principal_cache_size: int = 10000
+    principal_cache_ttl: float = 60.0
+
+    default_page_size: int = 100
+    max_page_size: int = 1000
+    import_batch_size: int = 500
+
+    feed_cache_size: int = 512
+    feed_cache_ttl: float = 30.0
+
+    fast_responses: bool = False
+
+    notification_batch_size: int = 20
+    # На весь деплой: рассылает только один воркер, держащий аренду в коллекции leases
+    notification_rate_per_second: float = 25.0
+    notification_max_attempts: int = 8
+    notification_poll_interval: float = 1.0
+
+    live_queue_size: int = 100
+    live_heartbeat_interval: float = 15.0
+
+    metrics_enabled: bool = True
+    event_loop_lag_interval: float = 0.5
+
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # memory | mongo
+    rate_limit_auth_per_minute: float = 20.0
+    rate_limit_auth_burst: int = 10
+    rate_limit_search_per_minute: float = 120.0
+    rate_limit_search_burst: int = 30
+    shed_lag_threshold: float = 0.25
+    shed_auth_max_in_flight: int = 32
+    shed_search_max_in_flight: int = 64
+    shed_feed_max_in_flight: int = 512
+    shed_bulk_max_in_flight: int = 4
 
     class Config:
         env_file = ".env"
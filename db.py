@@ -1,7 +1,47 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from core.config import settings
+from metrics import MongoCommandMetrics
 
-client = AsyncIOMotorClient(settings.mongo_uri)
-db = client[settings.mongo_database_name]
 
-collection = db["users"]
\ No newline at end of file
+class Database:
+    """
+    Per-process handle to the Motor database. The client is opened in the app
+    lifespan (each worker gets its own pool) or lazily on first use in scripts.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._database = None
+
+    def connect(self, client=None):
+        if self._database is not None:
+            return
+        self.client = client or AsyncIOMotorClient(
+            settings.mongo_uri,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+            event_listeners=[MongoCommandMetrics()] if settings.metrics_enabled else [],
+        )
+        self._database = self.client[settings.mongo_database_name]
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self._database = None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._database is None:
+            self.connect()
+        return getattr(self._database, name)
+
+    def __getitem__(self, name):
+        if self._database is None:
+            self.connect()
+        return self._database[name]
+
+
+db = Database()
@@ -1,49 +1,24 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from datetime import datetime
 from typing import Optional
 from db import db
-from models import Event, User, ApplicationCreate, EventType
-from pydantic import BaseModel, validator
+from models import Event, EventType, User, LocatedEvent
 from security import role_checker
+from pagination import find_after, page_size
+from responses import NEXT_CURSOR_HEADER, ndjson_response, render_json, wants_ndjson
+from feed_cache import feed_cache
+from search import facet_filters, search
+from pagination import SORT, decode_cursor, take_page
+from bulk_io import export_response
+from recurrence import merge_occurrences
+from timeutils import naive_utc
 
-def is_valid_dukat_room(tower: str, room_number: str) -> bool:
-    # Placeholder for actual room validation logic
-    return True
-
-class EventCreateRequest(BaseModel):
+class EventCreateRequest(LocatedEvent):
     name: str
     description: str
     start_time: datetime
     end_time: datetime
     image_url: str | None = None
-    event_type: EventType
-    location: dict | None = None
-
-    @validator('location', pre=True, always=True)
-    def validate_location(cls, v, values):
-        event_type = values.get('event_type')
-        if event_type == EventType.ONLINE:
-            if v is not None:
-                raise ValueError("Местоположение не должно быть указано для ОНЛАЙН мероприятия.")
-            return None
-        elif event_type == EventType.OFFLINE:
-            if v is None or not v:
-                raise ValueError("Местоположение обязательно для ОФФЛАЙН мероприятия.")
-
-            if "type" not in v or v["type"] not in ["dukat", "custom"]:
-                raise ValueError("Тип местоположения должен быть 'dukat' или 'custom'.")
-
-            if v["type"] == "dukat":
-                tower = v.get("tower")
-                room_number = v.get("room_number")
-                if tower not in ["F", "B"] or not room_number:
-                    raise ValueError("Для местоположения Dukat должны быть указаны 'tower' ('F' или 'B') и 'room_number'.")
-                if not is_valid_dukat_room(tower, room_number):
-                    raise ValueError("Неверная комната Dukat.")
-            elif v["type"] == "custom":
-                if not v.get("address"):
-                    raise ValueError("Для пользовательского местоположения должен быть указан непустой 'address'.")
-        return v
 
 router = APIRouter()
 
@@ -62,7 +37,7 @@ async def create_event(
         owner_id=owner_id,
         image_url=event.image_url,
         event_type=event.event_type,
-        location=event.location,
+        location=event.location.model_dump() if event.location else None,
     )
     
     await db.events.insert_one(
@@ -74,19 +49,133 @@ async def create_event(
 
 from typing import List
 from db import db
-from models import EventApplication
+from models import EventApplication, EventApplicationSummary, EventSearchResponse
+from fieldsets import Fieldset, fieldset
 from datetime import datetime
 
-@router.get("/", response_model=List[EventApplication])
-async def get_events(
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
-):
+
+def events_query(start_date: Optional[datetime], end_date: Optional[datetime]) -> dict:
     query = {"status": "approved"}
     if start_date:
         query["end_time"] = {"$gte": start_date}
     if end_date:
         query["start_time"] = {"$lte": end_date}
+    return query
+
+
+def span_query(start_date: Optional[datetime], end_date: Optional[datetime]) -> dict:
+    """Like events_query, but a series matches while any occurrence can still fall in the window."""
+    query = events_query(None, end_date)
+    if start_date:
+        query["$or"] = [{"end_time": {"$gte": start_date}}, {"series_end": {"$gte": start_date}}]
+    return query
+
+
+async def _series_in_window(start_date: Optional[datetime], end_date: Optional[datetime], projection: Optional[dict]):
+    query = {"status": "approved", "rrule": {"$exists": True}}
+    if start_date:
+        query["series_end"] = {"$gte": start_date}
+    if end_date:
+        query["start_time"] = {"$lte": end_date}
+    if projection is not None:
+        projection = {**projection, "end_time": 1, "rrule": 1}
+    return await db.applications.find(query, projection).to_list(None)
+
+
+async def events_after(
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    cursor: Optional[str],
+    projection: Optional[dict] = None,
+):
+    """
+    Plain events from the Mongo cursor merged with occurrences of series expanded in the window,
+    in (start_time, _id) order. Only series still running at the cursor are read, and their
+    occurrences are generated lazily from the cursor on.
+    """
+    window_start = start_date
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None and (window_start is None or naive_utc(window_start) < naive_utc(after[0])):
+        # Всё, что идёт после курсора, начинается не раньше него
+        window_start = naive_utc(after[0])
+    series = await _series_in_window(window_start, end_date, projection)
+    occurrences = merge_occurrences(series, window_start, end_date)
+    if after is not None:
+        occurrences = (document for document in occurrences if (document["start_time"], document["_id"]) > after)
+    pending = next(occurrences, None)
+    plain = {**events_query(start_date, end_date), "rrule": {"$exists": False}}
+    async for document in find_after(db.applications, plain, cursor, projection):
+        while pending is not None and (pending["start_time"], pending["_id"]) < (document["start_time"], document["_id"]):
+            yield pending
+            pending = next(occurrences, None)
+        yield document
+    while pending is not None:
+        yield pending
+        pending = next(occurrences, None)
+
+
+@router.get("/export")
+async def export_events(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|ics)$"),
+):
+    """
+    Whole approved schedule as NDJSON, CSV or iCalendar, streamed without paging.
+    NDJSON and CSV list every occurrence; iCalendar keeps a series as one VEVENT with its RRULE.
+    """
+    if format == "ics":
+        cursor = db.applications.find(span_query(start_date, end_date)).sort(SORT).batch_size(1000)
+        return export_response(cursor, format, "events")
+    events = events_after(start_date, end_date, None)
+    if format == "ndjson":
+        return ndjson_response(events, EventApplication, trusted=True)
+    return export_response(events, format, "events")
+
+
+@router.get("/search", response_model=EventSearchResponse)
+async def search_events(
+    response: Response,
+    q: Optional[str] = Query(None, min_length=2, max_length=200),
+    event_type: Optional[EventType] = None,
+    tower: Optional[str] = Query(None, pattern="^[FB]$"),
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    organizer_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+):
+    """
+    Full-text search with facets. Results are series-level: a recurring event is one hit
+    dated by its first occurrence, and month (filter and facet) uses that date too. The
+    start_date/end_date window keeps a series while any of its occurrences falls inside.
+    """
+    query = span_query(start_date, end_date)
+    if organizer_id:
+        query["organizer_id"] = organizer_id
+    filters = facet_filters(event_type.value if event_type else None, tower, month)
+
+    events, facets, next_cursor = await search(db.applications, query, q, filters, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return {"items": events, "facets": facets}
+
+@router.get("/", response_model=List[EventApplicationSummary])
+async def get_events(
+    request: Request,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_size),
+    format: Optional[str] = None,
+    fields: Fieldset = Depends(fieldset(EventApplication, EventApplicationSummary)),
+):
+    if wants_ndjson(request, format):
+        return ndjson_response(events_after(start_date, end_date, cursor, fields.projection), fields.model, trusted=True)
+
+    async def render():
+        events, next_cursor = await take_page(events_after(start_date, end_date, cursor, fields.projection), limit)
+        return render_json(fields.model, events, trusted=True), {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
 
-    events = await db.applications.find(query).to_list(1000)
-    return events
+    return await feed_cache.serve(request, render)
@@ -0,0 +1,92 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Protocol, Tuple
+
+from fastapi import Request, Response, status
+
+from core.config import settings
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[CachedResponse]: ...
+
+    async def set(self, key: str, value: CachedResponse, ttl: float) -> None: ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, Tuple[float, CachedResponse]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+Renderer = Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]
+
+
+class ResponseCache:
+    """
+    Read-through cache of rendered JSON responses for the public feeds,
+    keyed by path and query parameters, with ETag / If-None-Match support.
+    Each worker has its own cache and invalidate() only clears that one, so other
+    workers may serve a feed up to FEED_CACHE_TTL old; that staleness is accepted.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.generation = 0
+
+    @staticmethod
+    def key(request: Request) -> str:
+        return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+    async def serve(self, request: Request, render: Renderer) -> Response:
+        key = self.key(request)
+        cached = await self.backend.get(key)
+        if cached is None:
+            generation = self.generation
+            body, headers = await render()
+            cached = CachedResponse(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"', headers)
+            # Если во время рендера прошла модерация, результат уже может быть устаревшим
+            if generation == self.generation:
+                await self.backend.set(key, cached, self.ttl)
+
+        headers = {"ETag": cached.etag, **cached.headers}
+        if request.headers.get("if-none-match") == cached.etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+    async def invalidate(self):
+        self.generation += 1
+        await self.backend.clear()
+
+
+feed_cache = ResponseCache(MemoryCacheBackend(settings.feed_cache_size), settings.feed_cache_ttl)
@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Callable, FrozenSet, NamedTuple, Optional, Type
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel, create_model
+
+# Без этих полей нельзя построить курсор следующей страницы
+CURSOR_FIELDS = frozenset({"_id", "start_time"})
+
+
+class Fieldset(NamedTuple):
+    model: Type[BaseModel]
+    projection: Optional[dict]  # None — документ целиком
+
+
+def _field_names(model: Type[BaseModel]) -> dict:
+    """Accepted spellings (field name and alias) -> field name."""
+    names = {}
+    for name, field in model.model_fields.items():
+        names[name] = name
+        if field.alias:
+            names[field.alias] = name
+    return names
+
+
+@lru_cache(maxsize=256)
+def sparse_model(model: Type[BaseModel], field_names: FrozenSet[str]) -> Type[BaseModel]:
+    """Copy of the model with only the given fields; cached per field set."""
+    definitions = {
+        name: (field.annotation, field)
+        for name, field in model.model_fields.items()
+        if name in field_names
+    }
+    return create_model(f"{model.__name__}Fields", **definitions)
+
+
+def _projection(model: Type[BaseModel], field_names) -> dict:
+    projection = {model.model_fields[name].alias or name: 1 for name in field_names}
+    projection.update(dict.fromkeys(CURSOR_FIELDS, 1))
+    return projection
+
+
+def fieldset(model: Type[BaseModel], summary: Type[BaseModel]) -> Callable[..., Fieldset]:
+    """
+    Dependency for the fields= sparse fieldset of a list endpoint. Without the parameter
+    the summary fields are returned, fields=all returns whole documents.
+    """
+    names = _field_names(model)
+    summary_fields = frozenset(summary.model_fields)
+    summary_projection = _projection(model, summary_fields)
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description="Поля через запятую или all; по умолчанию — краткая сводка",
+        ),
+    ) -> Fieldset:
+        if fields is None:
+            return Fieldset(summary, summary_projection)
+        if fields == "all":
+            return Fieldset(model, None)
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - names.keys()
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Неизвестные поля: {', '.join(sorted(unknown))}",
+            )
+        field_names = frozenset(names[field] for field in requested | CURSOR_FIELDS)
+        if field_names == summary_fields:
+            return Fieldset(summary, summary_projection)
+        return Fieldset(sparse_model(model, field_names), _projection(model, field_names))
+
+    return dependency
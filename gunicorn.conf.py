@@ -0,0 +1,53 @@
+import asyncio
+import os
+import shutil
+
+from core.config import settings
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.web_concurrency
+worker_class = "uvicorn.workers.UvicornWorker"
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+# Иначе за nginx все клиенты видны с его адреса и делят один лимит на вход
+forwarded_allow_ips = settings.forwarded_allow_ips
+
+
+def on_starting(server):
+    # Каталог метрик пересоздаётся до импорта модулей приложения: prometheus_client открывает
+    # в нём файлы уже при импорте metrics (его тянет за собой db)
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir)
+
+    # Индексы и журнал брони готовятся один раз в мастере, воркеры (форки) получают уже выставленный флаг
+    from pymongo.errors import PyMongoError
+
+    from indexes import ensure_indexes
+    from db import db
+    import reservations
+
+    async def bootstrap():
+        db.connect()
+        try:
+            await ensure_indexes(db)
+            await reservations.backfill()
+        finally:
+            db.close()
+
+    try:
+        asyncio.run(bootstrap())
+    except PyMongoError as exc:
+        # Например, Mongo ещё не поднялась — тогда индексы создаст каждый воркер при старте
+        server.log.warning("Index bootstrap failed, workers will retry: %s", exc)
+        return
+    settings.ensure_indexes_on_startup = False
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,327 @@
+"""
+Declarative index registry.
+
+    python -m indexes apply     # create missing indexes
+    python -m indexes explain   # print plans for every query shape, exit 1 on COLLSCAN
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+import reservations
+import search
+from pagination import SORT as PAGE_SORT
+from recurrence import span_filter
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # Один аккаунт Telegram — один пользователь; у непривязанных поля нет
+        IndexModel(
+            [("user_tg_id", ASCENDING)],
+            name="tg_id_unique",
+            unique=True,
+            partialFilterExpression={"user_tg_id": {"$type": "number"}},
+        ),
+    ],
+    "bot_fsm": [
+        # Брошенный на середине диалог регистрации удаляется через сутки
+        IndexModel([("updated_at", ASCENDING)], name="updated_ttl", expireAfterSeconds=24 * 3600),
+    ],
+    "applications": [
+        # Равенство (status, room_id), затем диапазоны по времени — форма запроса на пересечение
+        IndexModel(
+            [("status", ASCENDING), ("location.room_id", ASCENDING), ("start_time", ASCENDING), ("end_time", ASCENDING)],
+            name="status_room_time",
+        ),
+        IndexModel([("status", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)], name="status_start"),
+        IndexModel(
+            [("organizer_id", ASCENDING), ("status", ASCENDING), ("start_time", ASCENDING)],
+            name="organizer_status_start",
+        ),
+        # Серии выбираются по охвату [start_time, series_end]; разовых заявок в индексе нет
+        IndexModel(
+            [("status", ASCENDING), ("series_end", ASCENDING), ("start_time", ASCENDING)],
+            name="series_status_end",
+            partialFilterExpression={"rrule": {"$exists": True}},
+        ),
+        # Поиск по ленте: status — префикс текстового индекса, запрос всегда задаёт его равенством
+        IndexModel(
+            [("status", ASCENDING), ("title", TEXT), ("description", TEXT)],
+            name="status_title_description_text",
+            weights={"title": 5, "description": 1},
+            default_language="russian",
+        ),
+    ],
+    "notification_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("lock", ASCENDING)], name="lock", sparse=True),
+        # Доставленные уведомления удаляются через неделю
+        IndexModel([("sent_at", ASCENDING)], name="sent_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "refresh_families": [
+        # Документ семейства удаляется, когда истекает последний выданный refresh-токен
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        # Корзина, к которой час не обращались, уже полная — её можно удалить
+        IndexModel([("updated_at", ASCENDING)], name="updated_ttl", expireAfterSeconds=3600),
+    ],
+    "room_occupancy": [
+        IndexModel([("room_id", ASCENDING), ("day", ASCENDING)], name="room_day"),
+    ],
+}
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: Optional[dict] = None
+    sort: Optional[list] = None
+    pipeline: Optional[list] = None
+
+
+def query_shapes() -> List[QueryShape]:
+    """Every query shape the routers issue, with representative values."""
+    now = datetime.utcnow()
+    later = now + timedelta(hours=2)
+    return [
+        QueryShape("auth.login", "users", {"email": "user@example.com"}),
+        QueryShape("security.get_user_from_db", "users", {"_id": "user-id"}),
+        QueryShape("bot.link", "users", {"user_tg_id": 123456789, "_id": {"$ne": "user-id"}}),
+        QueryShape("bot.unlink", "users", {"user_tg_id": 123456789}),
+        QueryShape(
+            "applications.pendings.student",
+            "applications",
+            {"organizer_id": "user-id", "status": "pending"},
+            sort=PAGE_SORT,
+        ),
+        QueryShape("applications.pendings", "applications", {"status": "pending"}, sort=PAGE_SORT),
+        QueryShape("applications.all", "applications", {"status": "approved"}, sort=PAGE_SORT),
+        QueryShape("applications.one", "applications", {"_id": "application-id"}),
+        QueryShape(
+            "applications.moderate.conflict",
+            "applications",
+            {"status": "approved", "_id": {"$ne": "application-id"}, **span_filter(now, later)},
+        ),
+        QueryShape(
+            "applications.moderate_batch.conflict",
+            "applications",
+            {"status": "approved", "$or": [span_filter(now, later), span_filter(later, later + timedelta(hours=2))]},
+        ),
+        QueryShape(
+            "applications.moderate_batch.lookup",
+            "applications",
+            {"_id": {"$in": ["application-id", "other-application-id"]}},
+        ),
+        QueryShape(
+            "events.list",
+            "applications",
+            {"status": "approved", "end_time": {"$gte": now}, "start_time": {"$lte": later}, "rrule": {"$exists": False}},
+            sort=PAGE_SORT,
+        ),
+        QueryShape(
+            "events.list.series",
+            "applications",
+            {"status": "approved", "rrule": {"$exists": True}, "series_end": {"$gte": now}, "start_time": {"$lte": later}},
+        ),
+        QueryShape(
+            "availability.busy_rooms.series",
+            "applications",
+            {
+                "status": "approved",
+                "location.room_id": {"$exists": True},
+                "rrule": {"$exists": True},
+                "start_time": {"$lt": later},
+                "series_end": {"$gt": now},
+            },
+        ),
+        QueryShape(
+            "availability.room_bookings",
+            "applications",
+            {
+                "status": "approved",
+                "location.room_id": "room-id",
+                "start_time": {"$lt": later},
+                "$or": [{"end_time": {"$gt": now}}, {"series_end": {"$gt": now}}],
+            },
+        ),
+        QueryShape(
+            "events.search",
+            "applications",
+            pipeline=search.page_pipeline({"status": "approved"}, "хакатон", {}, None, 20),
+        ),
+        QueryShape(
+            "events.search.browse",
+            "applications",
+            pipeline=search.page_pipeline(
+                {"status": "approved", "$or": [{"end_time": {"$gte": now}}, {"series_end": {"$gte": now}}]},
+                None,
+                search.facet_filters("OFFLINE", "F", None),
+                None,
+                20,
+            ),
+        ),
+        QueryShape(
+            "events.search.facets",
+            "applications",
+            pipeline=search.facet_pipeline(
+                {"status": "approved", "$or": [{"end_time": {"$gte": now}}, {"series_end": {"$gte": now}}]}, None, {}
+            ),
+        ),
+        QueryShape(
+            "availability.busy_rooms",
+            "applications",
+            pipeline=[
+                {
+                    "$match": {
+                        "status": "approved",
+                        "location.room_id": {"$exists": True},
+                        "start_time": {"$lt": later},
+                        "end_time": {"$gt": now},
+                    }
+                },
+                {"$group": {"_id": "$location.room_id"}},
+            ],
+        ),
+        QueryShape(
+            "booking_index.load",
+            "applications",
+            {
+                "status": "approved",
+                "location.room_id": {"$exists": True},
+                "$or": [{"end_time": {"$gt": now}}, {"rrule": {"$exists": True}, "series_end": {"$gt": now}}],
+            },
+        ),
+        QueryShape(
+            "notifications.organizer",
+            "users",
+            {"_id": "user-id"},
+        ),
+        QueryShape(
+            "notifications.claim",
+            "notification_outbox",
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "locked_until": {"$lt": now}},
+                ]
+            },
+            sort=[("next_attempt_at", ASCENDING)],
+        ),
+        QueryShape(
+            "notifications.claim.lease",
+            "notification_outbox",
+            {
+                "_id": {"$in": ["job-id", "other-job-id"]},
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "locked_until": {"$lt": now}},
+                ],
+            },
+        ),
+        QueryShape("notifications.claimed", "notification_outbox", {"lock": "lock-id"}),
+        QueryShape(
+            "notifications.leader",
+            "leases",
+            {"_id": "notification_worker", "$or": [{"holder": "holder-id"}, {"expires_at": {"$lt": now}}]},
+        ),
+        QueryShape(
+            "refresh_tokens.rotate",
+            "refresh_families",
+            {"_id": "family-id", "jti": "token-id", "expires_at": {"$gt": now}},
+        ),
+        QueryShape(
+            "reservations.claim",
+            "room_reservations",
+            reservations.claim_operation("room-id:2025-09-01", now, "room-id", "application-id", now, later)[0],
+        ),
+        QueryShape("reservations.release", "room_reservations", {"_id": {"$in": ["room-id:2025-09-01"]}}),
+        QueryShape(
+            "occupancy.week",
+            "room_occupancy",
+            {"room_id": {"$in": ["room-id"]}, "day": {"$gte": now, "$lte": later}},
+        ),
+    ]
+
+
+async def ensure_indexes(database):
+    """Create every registered index that does not exist yet."""
+    for collection_name, models in INDEXES.items():
+        collection = database[collection_name]
+        existing = {index["name"] async for index in collection.list_indexes()}
+        missing = [model for model in models if model.document["name"] not in existing]
+        if not missing:
+            continue
+        try:
+            created = await collection.create_indexes(missing)
+            logger.info("Created indexes on %s: %s", collection_name, ", ".join(created))
+        except OperationFailure as exc:
+            # Например, дубликаты email не дают построить уникальный индекс — приложение всё равно стартует
+            logger.error("Failed to create indexes on %s: %s", collection_name, exc)
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = []
+    stage = plan.get("stage")
+    if stage:
+        stages.append(f"{stage}({plan['indexName']})" if "indexName" in plan else stage)
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _winning_plan(explain: dict) -> dict:
+    if "queryPlanner" in explain:
+        return explain["queryPlanner"]["winningPlan"]
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"]["queryPlanner"]["winningPlan"]
+    return {}
+
+
+async def explain_shapes(database) -> bool:
+    """Print the winning plan of every query shape. Returns False if any shape scans a collection."""
+    ok = True
+    for shape in query_shapes():
+        if shape.pipeline is not None:
+            explain = await database.command(
+                "aggregate", shape.collection, pipeline=shape.pipeline, explain=True
+            )
+        else:
+            command = {"find": shape.collection, "filter": shape.filter}
+            if shape.sort:
+                command["sort"] = dict(shape.sort)
+            explain = await database.command("explain", command, verbosity="queryPlanner")
+        stages = _plan_stages(_winning_plan(explain))
+        scan = "COLLSCAN" in stages
+        ok = ok and not scan
+        print(f"{'!!' if scan else 'ok'}  {shape.name:40s} {' <- '.join(stages)}")
+    return ok
+
+
+async def _main(command: str) -> int:
+    from db import db
+
+    if command == "apply":
+        await ensure_indexes(db)
+        return 0
+    if command == "explain":
+        return 0 if await explain_shapes(db) else 1
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "")))
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+import pubsub
+from core.config import settings
+from models import User
+from security import role_checker, user_from_token
+
+router = APIRouter()
+
+# Топики: room:<room_id> — изменения брони комнаты, user:<user_id> — статусы своих заявок
+
+
+def moderation_message(application: dict) -> str:
+    location = application.get("location") or {}
+    return json.dumps({
+        "type": "moderation",
+        "application_id": application["_id"],
+        "status": application["status"],
+        "title": application["title"],
+        "room_id": location.get("room_id"),
+        "start_time": application["start_time"].isoformat(),
+        "end_time": application["end_time"].isoformat(),
+    }, ensure_ascii=False)
+
+
+async def publish_moderation(application: dict):
+    message = moderation_message(application)
+    await pubsub.broker.publish(f"user:{application['organizer_id']}", message)
+    room_id = (application.get("location") or {}).get("room_id")
+    if room_id:
+        await pubsub.broker.publish(f"room:{room_id}", message)
+
+
+def _topics(user: User, rooms: Optional[str], mine: bool) -> List[str]:
+    topics = [f"room:{room_id}" for room_id in (rooms or "").split(",") if room_id]
+    if mine:
+        topics.append(f"user:{user.id}")
+    return topics
+
+
+@router.websocket("/ws")
+async def live_websocket(
+    websocket: WebSocket,
+    token: str,
+    rooms: Optional[str] = None,
+    mine: bool = True,
+):
+    """
+    Push moderation events for the given rooms (comma separated ids) and,
+    with mine=true, for the user's own applications. The token is the access token.
+    """
+    user = await user_from_token(token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscription = pubsub.broker.subscribe(_topics(user, rooms, mine))
+
+    async def pump():
+        while True:
+            message = await subscription.get()
+            if message is None:
+                # Клиент не успевает читать — отключаем, после переподключения он перечитает состояние
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(message)
+
+    async def drain():
+        # Входящие сообщения не нужны, но их чтение замечает отключение клиента
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(drain())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        pubsub.broker.unsubscribe(subscription)
+
+
+async def _sse_stream(subscription: pubsub.Subscription):
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout=settings.live_heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if message is None:
+                yield b"event: overflow\ndata: {}\n\n"
+                return
+            yield f"data: {message}\n\n".encode()
+    finally:
+        pubsub.broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def live_events(
+    rooms: Optional[str] = Query(None, description="Comma separated room ids"),
+    mine: bool = True,
+    current_user: User = Depends(role_checker(["student", "curator", "admin"])),
+):
+    """
+    Server-sent events variant of /live/ws for clients that cannot use WebSockets.
+    """
+    subscription = pubsub.broker.subscribe(_topics(current_user, rooms, mine))
+    return StreamingResponse(
+        _sse_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,33 +1,151 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
+from pymongo.errors import PyMongoError
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from auth import router as auth_router
 from applications import router as applications_router
 from rooms import router as rooms_router
 from events import router as events_router
+from live import router as live_router
+from booking_index import booking_index
+from room_catalog import RoomCatalogUnavailable, room_catalog
+from hashing import password_hasher
+from indexes import ensure_indexes
+import reservations
+from db import db
+from responses import NEXT_CURSOR_HEADER, DefaultResponse
+from notifications import NotificationWorker
+from bot import close_bot, get_bot
+from metrics import MetricsMiddleware, render_metrics, sample_event_loop_lag
+from ratelimit import RateLimitMiddleware, make_backend
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up():
+    """Indexes, the booking journal and the in-memory caches; each step is skipped once done."""
+    if settings.ensure_indexes_on_startup:
+        await ensure_indexes(db)
+        await reservations.backfill()
+        settings.ensure_indexes_on_startup = False
+    if not booking_index.loaded:
+        await booking_index.rebuild()
+    if not room_catalog.loaded:
+        await room_catalog.refresh()
+
+
+async def retry_warm_up():
+    delay = 1.0
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await warm_up()
+            logger.info("Startup load finished")
+            return
+        except PyMongoError as exc:
+            logger.warning("Startup load failed, retrying in %ss: %s", delay, exc)
+            delay = min(delay * 2, 30.0)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Каждый воркер открывает свой пул соединений и прогревает свои кэши
+    db.connect()
+    try:
+        await warm_up()
+        warm_up_task = None
+    except PyMongoError as exc:
+        # Воркер стартует и без Mongo: данные догрузятся в фоне, а зависящие от них ручки до тех пор отвечают 503
+        logger.warning("Startup load failed, retrying in background: %s", exc)
+        warm_up_task = asyncio.create_task(retry_warm_up())
+
+    notification_worker = NotificationWorker(get_bot())
+    notification_task = asyncio.create_task(notification_worker.run())
+    background_tasks = [
+        asyncio.create_task(sample_event_loop_lag(settings.event_loop_lag_interval)),
+        asyncio.create_task(
+            booking_index.follow(settings.booking_index_refresh_interval, settings.booking_index_change_stream)
+        ),
+        asyncio.create_task(
+            room_catalog.follow(settings.room_catalog_refresh_interval, settings.room_catalog_change_stream)
+        ),
+    ]
+    if warm_up_task is not None:
+        background_tasks.append(warm_up_task)
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    notification_worker.stop()
+    await asyncio.gather(notification_task, *background_tasks, return_exceptions=True)
+    await close_bot()
+    password_hasher.shutdown()
+    db.close()
+
 
 app = FastAPI(
     title="Univent API",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=DefaultResponse,
 )
 
+@app.exception_handler(RoomCatalogUnavailable)
+async def room_catalog_unavailable(request, exc):
+    # Без каталога комнату нельзя проверить, а room_id клиента не принимается
+    return DefaultResponse(
+        {"detail": "Каталог комнат ещё не загружен"},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
+
+
+# Внутри CORS, чтобы браузер мог прочитать ответы 429/503
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware, backend=make_backend())
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Без этого браузер не отдаст клиенту курсор следующей страницы и ETag
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(applications_router, prefix="/applications", tags=["applications"])
 app.include_router(rooms_router, prefix="/rooms", tags=["rooms"])
 app.include_router(events_router, prefix="/events", tags=["events"])
+app.include_router(live_router, prefix="/live", tags=["live"])
 
 @app.get("/")
 async def ping():
     return {"message": "PROOOOOOOOOD!"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=settings.web_concurrency,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+    )
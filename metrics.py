@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+
+registry = CollectorRegistry()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    registry=registry,
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "Mongo command latency by collection and query shape",
+    ["collection", "command", "shape"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    registry=registry,
+)
+MONGO_DOCUMENTS_RETURNED = Counter(
+    "mongo_documents_returned_total",
+    "Documents returned by Mongo commands",
+    ["collection", "command", "shape"],
+    registry=registry,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total",
+    "Failed Mongo commands",
+    ["collection", "command"],
+    registry=registry,
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between a scheduled event loop wakeup and the actual one",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    registry=registry,
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt hash/verify time on the worker pool",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+    registry=registry,
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending",
+    "bcrypt jobs running or queued on the worker pool",
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+# Команды, у которых нет коллекции в значении первого ключа
+_NO_COLLECTION = {"getMore", "endSessions", "ping", "hello", "isMaster", "ismaster", "buildInfo"}
+
+
+def _shape(command_name: str, command: dict) -> str:
+    if command_name == "find" or command_name == "count":
+        return ",".join(sorted(command.get("filter", command.get("query")) or {})) or "-"
+    if command_name == "aggregate":
+        return ">".join(next(iter(stage)) for stage in command.get("pipeline", [])) or "-"
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or [{}]
+        return ",".join(sorted(statements[0].get("q", {}))) or "-"
+    if command_name == "findAndModify":
+        return ",".join(sorted(command.get("query", {}))) or "-"
+    return "-"
+
+
+def _documents_returned(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return 1 if reply["value"] else 0
+    return int(reply.get("n", 0))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records duration and documents returned per collection and query shape."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple, Tuple[Tuple[str, str, str], int]] = {}
+        self._cursors: Dict[int, Tuple[str, str, str]] = {}
+
+    def started(self, event):
+        command_name = event.command_name
+        cursor_id = 0
+        if command_name == "getMore":
+            # getMore продолжает курсор исходного запроса — относим его к той же форме
+            cursor_id = event.command["getMore"]
+            labels = self._cursors.get(cursor_id, (event.command.get("collection", "-"), "getMore", "-"))
+        elif command_name in _NO_COLLECTION:
+            return
+        else:
+            collection = event.command.get(command_name)
+            labels = (collection if isinstance(collection, str) else "-", command_name, _shape(command_name, event.command))
+        self._pending[(event.connection_id, event.request_id)] = (labels, cursor_id)
+
+    def succeeded(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        labels, cursor_id = pending
+        MONGO_COMMAND_LATENCY.labels(*labels).observe(event.duration_micros / 1e6)
+        MONGO_DOCUMENTS_RETURNED.labels(*labels).inc(_documents_returned(event.reply))
+        cursor = event.reply.get("cursor")
+        if not cursor:
+            return
+        if cursor.get("id"):
+            if len(self._cursors) > 10000:
+                self._cursors.clear()
+            self._cursors[cursor["id"]] = labels
+        elif cursor_id:
+            self._cursors.pop(cursor_id, None)
+
+    def failed(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            labels = pending[0]
+            MONGO_COMMAND_FAILURES.labels(labels[0], labels[1]).inc()
+
+
+def route_template(scope, root_path: str) -> str:
+    """Full template of the matched route, router prefixes and mount paths included."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    # В scope лежит сам маршрут роутера: его path — без префикса include_router и Mount.
+    # Префикс — часть пути запроса до первого "/", с которого остаток совпадает с шаблоном
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is not None:
+        for i, char in enumerate(path):
+            if char == "/" and path_regex.match(path[i:]):
+                return path[:i] + route.path
+    return route.path
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency histogram, labelled by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        root_path = scope.get("root_path", "")
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], route_template(scope, root_path), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+
+_recent_lag = 0.0
+
+
+def recent_event_loop_lag() -> float:
+    """Lag of the last sample, for load shedding."""
+    return _recent_lag
+
+
+async def sample_event_loop_lag(interval: float):
+    global _recent_lag
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        _recent_lag = max(time.perf_counter() - started - interval, 0.0)
+        EVENT_LOOP_LAG.observe(_recent_lag)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    # При нескольких воркерах gunicorn каждый пишет в PROMETHEUS_MULTIPROC_DIR, а отдаём сумму
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        combined = CollectorRegistry()
+        multiprocess.MultiProcessCollector(combined)
+        return generate_latest(combined), CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
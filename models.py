@@ -1,11 +1,14 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, ValidationInfo, field_validator, model_validator
+from typing import Annotated, Literal, Optional, List, Dict, Tuple, Union
 from datetime import datetime, date
 from bson import ObjectId
 from fastapi import Form
 from fastapi.security import OAuth2PasswordRequestForm
 from enum import Enum
 
+import recurrence
+from room_catalog import room_catalog
+
 
 
 
@@ -40,11 +43,14 @@ class User(BaseModel):
     role: str = "student"  # student, curator, admin
 
 class Room(BaseModel):
+    # Экземпляры из каталога комнат общие для всех запросов, поэтому неизменяемые
+    model_config = ConfigDict(frozen=True)
+
     id: Optional[str] = Field(default_factory=lambda: str(ObjectId()), alias="_id")
     name: str
     capacity: int
     tower: str
-    equipment: List[str] = []
+    equipment: Tuple[str, ...] = ()
 
 class Event(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(ObjectId()), alias="_id")
@@ -68,9 +74,76 @@ class EventApplication(BaseModel):
     image_url: str | None = None
     event_type: EventType
     location: dict | None = None
+    rrule: Optional[str] = None
+    series_id: Optional[str] = None  # у вхождения серии — id самой серии
 
 
-class ApplicationCreate(BaseModel):
+class EventApplicationSummary(BaseModel):
+    """Fields a list view needs; the default shape of the list endpoints."""
+    id: Optional[str] = Field(default_factory=lambda: str(ObjectId()), alias="_id")
+    title: str
+    start_time: datetime
+    end_time: datetime
+    organizer_name: str
+    status: str = "pending"
+    image_url: str | None = None
+    event_type: EventType
+    location: dict | None = None
+    series_id: Optional[str] = None
+
+
+class DukatLocation(BaseModel):
+    type: Literal["dukat"]
+    tower: Literal["F", "B"]
+    room_number: str = Field(min_length=1)
+    room_id: Optional[str] = None  # только из каталога, значение клиента отбрасывается
+
+    @model_validator(mode="before")
+    @classmethod
+    def drop_client_room_id(cls, data):
+        # По room_id ключуются журнал брони и индекс занятости, поэтому клиент его не задаёт
+        if isinstance(data, dict) and "room_id" in data:
+            data = {key: value for key, value in data.items() if key != "room_id"}
+        return data
+
+    @model_validator(mode="after")
+    def resolve_room(self):
+        room = room_catalog.find(self.tower, self.room_number)
+        if room is None:
+            raise ValueError("Неверная комната Dukat.")
+        self.room_id = room.id
+        return self
+
+
+class CustomLocation(BaseModel):
+    type: Literal["custom"]
+    address: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+
+class OnlineLocation(BaseModel):
+    type: Literal["online"]
+    url: Optional[str] = None
+
+
+Location = Annotated[Union[DukatLocation, CustomLocation, OnlineLocation], Field(discriminator="type")]
+
+
+class LocatedEvent(BaseModel):
+    """Event type and a location that agrees with it; shared by every create model."""
+    event_type: EventType
+    location: Optional[Location] = None
+
+    @model_validator(mode="after")
+    def location_matches_event_type(self):
+        online = self.location is None or self.location.type == "online"
+        if self.event_type == EventType.ONLINE and not online:
+            raise ValueError("Местоположение не должно быть указано для ОНЛАЙН мероприятия.")
+        if self.event_type == EventType.OFFLINE and online:
+            raise ValueError("Местоположение обязательно для ОФФЛАЙН мероприятия.")
+        return self
+
+
+class ApplicationCreate(LocatedEvent):
     title: str
     description: str
     start_time: datetime
@@ -78,31 +151,17 @@ class ApplicationCreate(BaseModel):
     expected_participants: int
     needs: str
     image_url: str | None = None
-    event_type: EventType
-    location: dict | None = None
+    rrule: str | None = None  # например FREQ=WEEKLY;BYDAY=MO,WE;COUNT=12
+
+    model_config = ConfigDict(use_enum_values=True)
+
+    @field_validator("rrule")
+    @classmethod
+    def validate_rrule(cls, v: Optional[str], info: ValidationInfo) -> Optional[str]:
+        if v is None or "start_time" not in info.data or "end_time" not in info.data:
+            return v
+        return recurrence.validate(v, info.data["start_time"], info.data["end_time"])
 
-    @validator("location", always=True)
-    def validate_location(cls, v, values):
-        event_type = values.get("event_type")
-        if event_type == EventType.ONLINE:
-            if v is not None:
-                raise ValueError("Местоположение не должно быть указано для ОНЛАЙН мероприятия.")
-        elif event_type == EventType.OFFLINE:
-            if v is None:
-                raise ValueError("Местоположение обязательно для ОФФЛАЙН мероприятия.")
-
-            if "type" not in v or v["type"] not in ["dukat", "custom"]:
-                raise ValueError("Тип местоположения должен быть 'dukat' или 'custom'.")
-
-            if v["type"] == "dukat":
-                tower = v.get("tower")
-                room_number = v.get("room_number")
-                if tower not in ["F", "B"] or not room_number:
-                    raise ValueError("Неверные данные местоположения Dukat.")
-            elif v["type"] == "custom":
-                if not v.get("address"):
-                    raise ValueError("Адрес обязателен для пользовательского местоположения.")
-        return v
 
 class UserCreate(BaseModel):
     full_name: str
@@ -115,6 +174,10 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class BookedSlot(BaseModel):
     title: str
     start_time: datetime
@@ -123,4 +186,38 @@ class BookedSlot(BaseModel):
 
 class RoomAvailabilityResponse(BaseModel):
     date: date
-    booked_slots: List[BookedSlot]
\ No newline at end of file
+    booked_slots: List[BookedSlot]
+
+
+class RoomOccupancy(BaseModel):
+    room_id: str
+    name: str
+    capacity: int
+    days: Dict[str, str]  # дата -> строка из 0/1 по 15-минутным слотам
+
+
+class TowerOccupancyResponse(BaseModel):
+    tower: str
+    week_start: date
+    slot_minutes: int
+    rooms: List[RoomOccupancy]
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class EventSearchResponse(BaseModel):
+    items: List[EventApplication]
+    facets: Optional[Dict[str, List[FacetCount]]] = None  # только на первой странице
+
+
+class ImportRowError(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []  # первые ошибки, не больше сотни
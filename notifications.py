@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# Статусы задания: pending -> sending -> sent | failed
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+
+
+def moderation_message(application: dict) -> Optional[str]:
+    location = application.get("location") or {}
+    place = location.get("room_number") or location.get("address") or "онлайн"
+    if application["status"] == "approved":
+        return f'Событие "{application["title"]}" в аудитории {place} разрешено для проведения'
+    if application["status"] in ("rejected", "not_approved"):
+        return f'Событие "{application["title"]}" в аудитории {place} не может быть проведено'
+    return None
+
+
+async def enqueue_notification(chat_id: int, text: str):
+    now = datetime.utcnow()
+    await db.notification_outbox.insert_one({
+        "_id": str(uuid.uuid4()),
+        "chat_id": chat_id,
+        "text": text,
+        "status": PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    })
+
+
+async def notify_moderation(application: dict):
+    """Queue a Telegram message for the organizer about the moderation decision."""
+    text = moderation_message(application)
+    if text is None:
+        return
+    organizer = await db.users.find_one({"_id": application["organizer_id"]}, {"user_tg_id": 1})
+    if organizer and organizer.get("user_tg_id"):
+        await enqueue_notification(organizer["user_tg_id"], text)
+
+
+async def notify_moderations(applications: List[dict]):
+    """Batched notify_moderation: one users lookup and one insert for the whole batch."""
+    messages = [(application, moderation_message(application)) for application in applications]
+    messages = [(application, text) for application, text in messages if text is not None]
+    if not messages:
+        return
+    organizers = await db.users.find(
+        {"_id": {"$in": list({application["organizer_id"] for application, _ in messages})}},
+        {"user_tg_id": 1},
+    ).to_list(None)
+    chat_ids = {user["_id"]: user.get("user_tg_id") for user in organizers}
+    now = datetime.utcnow()
+    jobs = [
+        {
+            "_id": str(uuid.uuid4()),
+            "chat_id": chat_ids[application["organizer_id"]],
+            "text": text,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for application, text in messages
+        if chat_ids.get(application["organizer_id"])
+    ]
+    if jobs:
+        await db.notification_outbox.insert_many(jobs)
+
+
+class SendRateLimiter:
+    """Paces sends to Telegram limits: a global rate and one message per chat per interval."""
+
+    def __init__(self, per_second: float, per_chat_interval: float):
+        self.interval = 1.0 / per_second
+        self.per_chat_interval = per_chat_interval
+        self._next_slot = 0.0
+        self._chat_next_slot: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        slot = max(now, self._next_slot, self._chat_next_slot.get(chat_id, 0.0))
+        self._next_slot = slot + self.interval
+        self._chat_next_slot[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        if len(self._chat_next_slot) > 10000:
+            self._chat_next_slot = {k: v for k, v in self._chat_next_slot.items() if v > now}
+
+
+class LeaderLease:
+    """
+    A named lease in the leases collection, held by one process at a time. The holder
+    renews it on every acquire(); if it dies, another process takes over once the lease
+    expires.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.holder = str(uuid.uuid4())
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await db.leases.update_one(
+                {"_id": self.name, "$or": [{"holder": self.holder}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": self.holder, "expires_at": now + self.ttl}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Фильтр не совпал, и upsert упёрся в _id: аренда у живого владельца
+            return False
+        return True
+
+    async def release(self):
+        await db.leases.delete_one({"_id": self.name, "holder": self.holder})
+
+
+class NotificationWorker:
+    """
+    Drains notification_outbox in batches. Jobs survive restarts: a batch is
+    leased, and a lease that expires (e.g. the worker died) makes the jobs due again.
+    Works with anything that has an aiogram-style send_message(chat_id, text).
+
+    Every web worker runs one, but only the holder of the leader lease sends, so
+    per_second is the rate of the whole deployment rather than of each process.
+    """
+
+    def __init__(
+        self,
+        bot,
+        batch_size: int = settings.notification_batch_size,
+        per_second: float = settings.notification_rate_per_second,
+        max_attempts: int = settings.notification_max_attempts,
+        poll_interval: float = settings.notification_poll_interval,
+        lease_seconds: float = 60.0,
+    ):
+        self.bot = bot
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.limiter = SendRateLimiter(per_second, per_chat_interval=1.0)
+        self.leader = LeaderLease("notification_worker", lease_seconds)
+        self._stopped = asyncio.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    async def claim_batch(self) -> List[dict]:
+        now = datetime.utcnow()
+        due = {
+            "$or": [
+                {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": SENDING, "locked_until": {"$lt": now}},
+            ]
+        }
+        candidates = await db.notification_outbox.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(
+            self.batch_size
+        ).to_list(None)
+        if not candidates:
+            return []
+        lock = str(uuid.uuid4())
+        await db.notification_outbox.update_many(
+            {"_id": {"$in": [job["_id"] for job in candidates]}, **due},
+            {"$set": {"status": SENDING, "lock": lock, "locked_until": now + self.lease}},
+        )
+        return await db.notification_outbox.find({"lock": lock}).to_list(None)
+
+    def _retry(self, job: dict, error: str, delay: Optional[float] = None) -> UpdateOne:
+        attempts = job["attempts"] + 1
+        if attempts >= self.max_attempts:
+            return UpdateOne(
+                {"_id": job["_id"]},
+                {"$set": {"status": FAILED, "attempts": attempts, "error": error}, "$unset": {"lock": ""}},
+            )
+        if delay is None:
+            delay = min(2 ** attempts, 3600)
+        return UpdateOne(
+            {"_id": job["_id"]},
+            {
+                "$set": {
+                    "status": PENDING,
+                    "attempts": attempts,
+                    "error": error,
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay),
+                },
+                "$unset": {"lock": ""},
+            },
+        )
+
+    async def send(self, job: dict) -> UpdateOne:
+        await self.limiter.wait(job["chat_id"])
+        try:
+            await self.bot.send_message(job["chat_id"], text=job["text"])
+        except TelegramRetryAfter as exc:
+            return self._retry(job, str(exc), delay=exc.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as exc:
+            # Пользователь заблокировал бота или чат не существует — повтор не поможет
+            return UpdateOne(
+                {"_id": job["_id"]},
+                {"$set": {"status": FAILED, "error": str(exc)}, "$unset": {"lock": ""}},
+            )
+        except Exception as exc:
+            logger.warning("Notification %s failed: %s", job["_id"], exc)
+            return self._retry(job, str(exc))
+        return UpdateOne(
+            {"_id": job["_id"]},
+            {"$set": {"status": SENT, "sent_at": datetime.utcnow()}, "$unset": {"lock": ""}},
+        )
+
+    async def drain_once(self) -> int:
+        jobs = await self.claim_batch()
+        if jobs:
+            results = [await self.send(job) for job in jobs]
+            await db.notification_outbox.bulk_write(results, ordered=False)
+        return len(jobs)
+
+    async def run(self):
+        while not self._stopped.is_set():
+            try:
+                sent = await self.drain_once() if await self.leader.acquire() else 0
+            except Exception:
+                logger.exception("Notification worker iteration failed")
+                sent = 0
+            if not sent:
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        try:
+            # Следующий воркер подхватит рассылку сразу, а не по истечении аренды
+            await self.leader.release()
+        except Exception:
+            logger.exception("Notification worker lease release failed")
@@ -0,0 +1,103 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List
+
+from bson import Binary
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from db import db
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Сетка занятости: документ на (комнату, день) с битовой маской 15-минутных слотов.
+# Строится из журнала брони (room_reservations) и обновляется при каждом его изменении.
+# Каждая запись в журнал увеличивает его version; сетка хранит версию, из которой построена,
+# и перезаписывается только более новой — иначе два параллельных refresh одного дня могли
+# бы записать устаревшую сетку последней.
+
+
+def day_bitmap(day: datetime, bookings: Iterable[dict]) -> int:
+    """Bit i is set when slot i of the day (00:00 + i * 15 min) overlaps a booking."""
+    bits = 0
+    end_of_day = day + timedelta(days=1)
+    for booking in bookings:
+        start = max(booking["start_time"], day)
+        end = min(booking["end_time"], end_of_day)
+        if start >= end:
+            continue
+        first = int((start - day).total_seconds() // (SLOT_MINUTES * 60))
+        last = -int(-(end - day).total_seconds() // (SLOT_MINUTES * 60))  # округление вверх
+        bits |= ((1 << (last - first)) - 1) << first
+    return bits
+
+
+def encode_bitmap(bits: int) -> Binary:
+    return Binary(bits.to_bytes(SLOTS_PER_DAY // 8, "little"))
+
+
+def slots_string(stored: bytes | None) -> str:
+    bits = int.from_bytes(stored, "little") if stored else 0
+    return "".join("1" if bits >> i & 1 else "0" for i in range(SLOTS_PER_DAY))
+
+
+def _occupancy_operation(journal: dict) -> UpdateOne:
+    version = journal.get("version", 0)
+    return UpdateOne(
+        # Если сетка уже не старее журнала, фильтр не совпадёт и upsert упрётся в _id
+        {"_id": journal["_id"], "version": {"$not": {"$gte": version}}},
+        {"$set": {
+            "room_id": journal["room_id"],
+            "day": journal["day"],
+            "version": version,
+            "slots": encode_bitmap(day_bitmap(journal["day"], journal.get("bookings", []))),
+        }},
+        upsert=True,
+    )
+
+
+async def _write(operations: List[UpdateOne]):
+    try:
+        await db.room_occupancy.bulk_write(operations, ordered=False)
+    except BulkWriteError as exc:
+        # Дубликат _id — сетка уже построена из той же или более новой версии журнала
+        if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+            raise
+
+
+async def refresh(keys: Iterable[str]):
+    """Recompute the grid for the given journal keys ('<room_id>:<YYYY-MM-DD>')."""
+    keys = list(set(keys))
+    if not keys:
+        return
+    journals = await db.room_reservations.find({"_id": {"$in": keys}}).to_list(None)
+    if journals:
+        await _write([_occupancy_operation(journal) for journal in journals])
+
+
+async def rebuild():
+    operations = []
+    async for journal in db.room_reservations.find({}):
+        operations.append(_occupancy_operation(journal))
+        if len(operations) >= 1000:
+            await _write(operations)
+            operations = []
+    if operations:
+        await _write(operations)
+
+
+async def week_grid(room_ids: List[str], week_start: date, days: int = 7) -> Dict[str, Dict[str, str]]:
+    """Return {room_id: {YYYY-MM-DD: slots}} for every room and day of the week, in one query."""
+    first_day = datetime.combine(week_start, time.min)
+    day_list = [first_day + timedelta(days=i) for i in range(days)]
+    stored = {
+        (document["room_id"], document["day"]): document["slots"]
+        for document in await db.room_occupancy.find(
+            {"room_id": {"$in": room_ids}, "day": {"$gte": day_list[0], "$lte": day_list[-1]}},
+            {"room_id": 1, "day": 1, "slots": 1},
+        ).to_list(None)
+    }
+    return {
+        room_id: {f"{day:%Y-%m-%d}": slots_string(stored.get((room_id, day))) for day in day_list}
+        for room_id in room_ids
+    }
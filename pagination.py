@@ -0,0 +1,77 @@
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, status
+
+from core.config import settings
+
+SORT = [("start_time", 1), ("_id", 1)]
+
+
+def page_size(
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+) -> int:
+    return limit
+
+
+def encode_cursor(document: dict) -> str:
+    raw = json.dumps([document["start_time"].isoformat(), str(document["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_time, document_id = json.loads(raw)
+        return datetime.fromisoformat(start_time), document_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор")
+
+
+def keyset_query(query: dict, cursor: Optional[str]) -> dict:
+    """Restrict the query to documents after the cursor in (start_time, _id) order."""
+    if not cursor:
+        return query
+    start_time, document_id = decode_cursor(cursor)
+    after = {
+        "$or": [
+            {"start_time": {"$gt": start_time}},
+            {"start_time": start_time, "_id": {"$gt": document_id}},
+        ]
+    }
+    return {"$and": [query, after]}
+
+
+def find_after(collection, query: dict, cursor: Optional[str], projection: Optional[dict] = None):
+    return collection.find(keyset_query(query, cursor), projection).sort(SORT)
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    cursor: Optional[str],
+    limit: int,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    # Берём на один документ больше, чтобы понять, есть ли следующая страница
+    documents = await find_after(collection, query, cursor, projection).limit(limit + 1).to_list(None)
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1])
+
+
+async def take_page(documents: AsyncIterator[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """fetch_page for an already ordered stream of documents, e.g. one merged from several sources."""
+    page = []
+    async for document in documents:
+        page.append(document)
+        if len(page) > limit:
+            break
+    await documents.aclose()
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,67 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Protocol, Set
+
+from core.config import settings
+
+
+class Subscription:
+    """
+    A consumer's bounded queue. A consumer that falls behind by more than the
+    queue size is cut off (get() returns None) instead of buffering without limit.
+    """
+
+    def __init__(self, topics: Iterable[str], maxsize: int):
+        self.topics = frozenset(topics)
+        self.overflowed = False
+        self._queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=maxsize + 1)
+        self._maxsize = maxsize
+
+    def offer(self, message: str):
+        if self.overflowed:
+            return
+        if self._queue.qsize() >= self._maxsize:
+            self.overflowed = True
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(message)
+
+    async def get(self) -> Optional[str]:
+        return await self._queue.get()
+
+
+class Broker(Protocol):
+    def subscribe(self, topics: Iterable[str]) -> Subscription: ...
+
+    def unsubscribe(self, subscription: Subscription) -> None: ...
+
+    async def publish(self, topic: str, message: str) -> None: ...
+
+
+class InProcessBroker:
+    """Fan-out within one process. A cross-worker broker can implement the same interface."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(topics, self.queue_size)
+        for topic in subscription.topics:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    async def publish(self, topic: str, message: str) -> None:
+        for subscription in tuple(self._subscribers.get(topic, ())):
+            subscription.offer(message)
+
+
+broker: Broker = InProcessBroker(settings.live_queue_size)
@@ -0,0 +1,232 @@
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional, Protocol, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+
+from core.config import settings
+from db import db
+from metrics import recent_event_loop_lag
+from security import decode_user_id
+
+
+class RateLimitBackend(Protocol):
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take one token from the bucket. Returns 0 if allowed, otherwise seconds until a token is available."""
+        ...
+
+
+class MemoryRateLimitBackend:
+    """Token buckets of one process. With several workers each one counts separately."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class MongoRateLimitBackend:
+    """
+    Buckets shared by all workers: refill and take happen in one pipeline findAndModify.
+    Idle buckets are removed by the TTL index on rate_limits.updated_at.
+    """
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        bucket = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"refilled": refilled, "updated_at": now}},
+                {
+                    "$set": {
+                        "allowed": {"$gte": ["$refilled", 1]},
+                        "tokens": {"$cond": [{"$gte": ["$refilled", 1]}, {"$subtract": ["$refilled", 1]}, "$refilled"]},
+                    }
+                },
+                {"$unset": "refilled"},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests of a route group. The cap shrinks multiplicatively while
+    event loop lag is above the threshold and grows back by one when it recovers.
+    """
+
+    def __init__(self, max_in_flight: int, lag_threshold: float, min_in_flight: int = 1):
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min(min_in_flight, max_in_flight)
+        self.lag_threshold = lag_threshold
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self._adjusted_at = 0.0
+
+    def _adjust(self):
+        now = time.monotonic()
+        if now - self._adjusted_at < 0.1:
+            return
+        self._adjusted_at = now
+        if recent_event_loop_lag() > self.lag_threshold:
+            self.limit = max(self.min_in_flight, int(self.limit * 0.75))
+        elif self.limit < self.max_in_flight:
+            self.limit += 1
+
+    def try_acquire(self) -> bool:
+        self._adjust()
+        if self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+class RouteGroup(NamedTuple):
+    name: str
+    methods: Tuple[str, ...]
+    paths: Tuple[str, ...]
+    limiter: ConcurrencyLimiter
+    rate_per_minute: Optional[float] = None
+    burst: int = 0
+    key: str = "ip"  # "ip" или "user" (без токена — по IP)
+
+
+def route_groups() -> Tuple[RouteGroup, ...]:
+    # У каждой группы свой лимит одновременных запросов, поэтому всплеск входов или
+    # поиска упирается в собственный потолок и не отнимает место у публичной ленты
+    lag = settings.shed_lag_threshold
+    return (
+        RouteGroup(
+            "auth",
+            ("POST",),
+            ("/auth/login", "/auth/register", "/auth/refresh"),
+            ConcurrencyLimiter(settings.shed_auth_max_in_flight, lag),
+            settings.rate_limit_auth_per_minute,
+            settings.rate_limit_auth_burst,
+            key="ip",
+        ),
+        RouteGroup(
+            "search",
+            ("GET",),
+            ("/rooms/available", "/rooms/occupancy", "/events/search"),
+            ConcurrencyLimiter(settings.shed_search_max_in_flight, lag),
+            settings.rate_limit_search_per_minute,
+            settings.rate_limit_search_burst,
+            key="user",
+        ),
+        RouteGroup(
+            "bulk",
+            ("GET", "POST"),
+            ("/events/export", "/applications/import"),
+            # Выгрузка держит соединение долго — таких запросов одновременно немного
+            ConcurrencyLimiter(settings.shed_bulk_max_in_flight, lag),
+        ),
+        RouteGroup(
+            "feed",
+            ("GET",),
+            ("/applications/all", "/events/"),
+            # Лента отдаётся из кэша и переживает лаг; её ограничивает только свой потолок
+            ConcurrencyLimiter(settings.shed_feed_max_in_flight, math.inf),
+        ),
+    )
+
+
+def _client_ip(scope) -> str:
+    # За прокси uvicorn подставляет адрес из X-Forwarded-For, если прокси входит в FORWARDED_ALLOW_IPS
+    client = scope.get("client")
+    return client[0] if client else "-"
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token if scheme.lower() == "bearer" and token else None
+    return None
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware: per-route-group token buckets (429) and adaptive
+    concurrency shedding (503). Requests outside every group pass through.
+    """
+
+    def __init__(self, app, backend: RateLimitBackend, groups: Optional[Iterable[RouteGroup]] = None):
+        self.app = app
+        self.backend = backend
+        self.groups = {}
+        for group in groups if groups is not None else route_groups():
+            for method in group.methods:
+                for path in group.paths:
+                    self.groups[(method, path)] = group
+
+    def _bucket_key(self, group: RouteGroup, scope) -> str:
+        if group.key == "user":
+            # Только подпись JWT, без обращения к базе
+            token = _bearer_token(scope)
+            user_id = decode_user_id(token) if token else None
+            if user_id:
+                return f"{group.name}:user:{user_id}"
+        return f"{group.name}:ip:{_client_ip(scope)}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        group = self.groups.get((scope["method"], scope["path"]))
+        if group is None:
+            return await self.app(scope, receive, send)
+
+        if group.rate_per_minute:
+            wait = await self.backend.take(self._bucket_key(group, scope), group.rate_per_minute / 60, group.burst)
+            if wait:
+                response = _reject(status.HTTP_429_TOO_MANY_REQUESTS, "Слишком много запросов, попробуйте позже", wait)
+                return await response(scope, receive, send)
+
+        if not group.limiter.try_acquire():
+            response = _reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Сервер перегружен, попробуйте позже", 1)
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            group.limiter.release()
+
+
+def make_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "mongo":
+        return MongoRateLimitBackend()
+    return MemoryRateLimitBackend()
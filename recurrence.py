@@ -0,0 +1,270 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from timeutils import naive_utc
+
+# Повторяющееся мероприятие хранится одним документом: start_time/end_time — первое
+# вхождение, rrule — правило, series_end — конец последнего вхождения. Вхождения
+# разворачиваются только в запрошенном окне.
+
+MAX_OCCURRENCES = 520  # десять лет еженедельных встреч
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+Interval = Tuple[datetime, datetime]
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int
+    by_day: Tuple[int, ...]  # дни недели, 0 — понедельник
+    count: Optional[int]
+    until: Optional[datetime]
+
+
+def _parse_until(value: str) -> datetime:
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            until = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # UNTIL в виде даты включает весь день
+        return until + timedelta(days=1) - timedelta(microseconds=1) if fmt == "%Y%m%d" else until
+    raise ValueError(f"Неверный UNTIL: {value}")
+
+
+@lru_cache(maxsize=1024)
+def parse_rrule(text: str) -> Rule:
+    """
+    Subset of RFC 5545 RRULE: FREQ=DAILY|WEEKLY, INTERVAL, BYDAY (weekly only, no
+    ordinals), and COUNT or UNTIL — a series must be finite.
+    """
+    parts = {}
+    for part in text.strip().removeprefix("RRULE:").split(";"):
+        name, _, value = part.partition("=")
+        if not value:
+            raise ValueError(f"Неверная часть правила: {part}")
+        parts[name.strip().upper()] = value.strip().upper()
+
+    unsupported = parts.keys() - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL"}
+    if unsupported:
+        raise ValueError(f"Неподдерживаемые части правила: {', '.join(sorted(unsupported))}")
+    freq = parts.get("FREQ")
+    if freq not in ("DAILY", "WEEKLY"):
+        raise ValueError("Поддерживаются только FREQ=DAILY и FREQ=WEEKLY")
+    try:
+        interval = int(parts.get("INTERVAL", "1"))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+    except ValueError:
+        raise ValueError("INTERVAL и COUNT должны быть целыми числами")
+    if interval < 1:
+        raise ValueError("INTERVAL должен быть положительным")
+    if (count is None) == ("UNTIL" not in parts):
+        raise ValueError("Нужно указать ровно одно из COUNT или UNTIL")
+    if count is not None and not 1 <= count <= MAX_OCCURRENCES:
+        raise ValueError(f"COUNT должен быть от 1 до {MAX_OCCURRENCES}")
+    until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+
+    by_day: Tuple[int, ...] = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY поддерживается только для FREQ=WEEKLY")
+        try:
+            by_day = tuple(sorted({WEEKDAYS.index(day.strip()) for day in parts["BYDAY"].split(",")}))
+        except ValueError:
+            raise ValueError("BYDAY — список из MO, TU, WE, TH, FR, SA, SU")
+    return Rule(freq, interval, by_day, count, until)
+
+
+def _starts(rule: Rule, first_start: datetime, not_before: Optional[datetime] = None) -> Iterator[datetime]:
+    """
+    Occurrence starts in order; the first one is always the series start. Whole periods
+    starting before not_before are skipped arithmetically instead of generated. An UNTIL
+    series stops after MAX_OCCURRENCES + 1 starts, enough for validate() to see it is too long.
+    """
+    produced = 0
+    if rule.freq == "DAILY":
+        step = timedelta(days=rule.interval)
+        skip = (not_before - first_start) // step if not_before and not_before > first_start else 0
+        produced = skip
+        candidates = (first_start + step * i for i in range(skip, MAX_OCCURRENCES + 1))
+    else:
+        days = rule.by_day or (first_start.weekday(),)
+        week = first_start - timedelta(days=first_start.weekday())
+        period = timedelta(weeks=rule.interval)
+        skip = (not_before - week) // period if not_before and not_before > week else 0
+        if skip:
+            # В первой неделе считаются только дни не раньше начала серии
+            produced = sum(1 for day in days if week + timedelta(days=day) >= first_start) + (skip - 1) * len(days)
+        candidates = (
+            week + period * i + timedelta(days=day)
+            for i in range(skip, MAX_OCCURRENCES + 1)
+            for day in days
+        )
+    limit = rule.count or MAX_OCCURRENCES + 1
+    if produced >= limit:
+        return
+    for start in candidates:
+        if start < first_start:
+            continue
+        if rule.until is not None and start > rule.until:
+            return
+        yield start
+        produced += 1
+        if produced == limit:
+            return
+
+
+def _min_gap(rule: Rule) -> timedelta:
+    if rule.freq == "DAILY":
+        return timedelta(days=rule.interval)
+    days = rule.by_day
+    if len(days) < 2:
+        return timedelta(weeks=rule.interval)
+    gaps = [b - a for a, b in zip(days, days[1:])] + [7 * rule.interval - days[-1] + days[0]]
+    return timedelta(days=min(gaps))
+
+
+def validate(rrule: str, start_time: datetime, end_time: datetime) -> str:
+    """Parse and check a rule against the first occurrence. Returns the canonical rule text."""
+    rule = parse_rrule(rrule)
+    start_time = naive_utc(start_time)
+    if rule.by_day and start_time.weekday() not in rule.by_day:
+        raise ValueError("День начала должен входить в BYDAY")
+    if rule.until is not None and rule.until < start_time:
+        raise ValueError("UNTIL раньше начала мероприятия")
+    # Та же граница, что у COUNT: не больше MAX_OCCURRENCES вхождений включительно
+    if rule.until is not None and sum(1 for _ in _starts(rule, start_time)) > MAX_OCCURRENCES:
+        raise ValueError(f"В серии должно быть не больше {MAX_OCCURRENCES} вхождений")
+    if naive_utc(end_time) - start_time > _min_gap(rule):
+        raise ValueError("Вхождения серии не должны пересекаться друг с другом")
+    return format_rrule(rule)
+
+
+def format_rrule(rule: Rule) -> str:
+    """Canonical RRULE text; UNTIL is written as a UTC date-time, as RFC 5545 requires for UTC starts."""
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.by_day:
+        parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in rule.by_day))
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    else:
+        parts.append(f"UNTIL={rule.until:%Y%m%dT%H%M%SZ}")
+    return ";".join(parts)
+
+
+def occurrences(application: dict, not_before: Optional[datetime] = None) -> Iterator[Interval]:
+    """(start, end) of every occurrence; with not_before, most of those ending before it are skipped."""
+    start_time, end_time = naive_utc(application["start_time"]), naive_utc(application["end_time"])
+    rrule = application.get("rrule")
+    if not rrule:
+        yield start_time, end_time
+        return
+    duration = end_time - start_time
+    # Пропущенные периоды целиком начинаются раньше not_before - duration, то есть и заканчиваются до not_before
+    skip_before = not_before - duration if not_before is not None else None
+    for start in _starts(parse_rrule(rrule), start_time, skip_before):
+        yield start, start + duration
+
+
+def intervals(application: dict) -> List[Interval]:
+    """Every (start, end) the application books: one for a plain application, all occurrences for a series."""
+    return list(occurrences(application))
+
+
+def series_end(rrule: str, start_time: datetime, end_time: datetime) -> datetime:
+    *_, last = occurrences({"start_time": start_time, "end_time": end_time, "rrule": rrule})
+    return last[1]
+
+
+def occurrences_between(
+    application: dict,
+    window_start: Optional[datetime],
+    window_end: Optional[datetime],
+) -> Iterator[Interval]:
+    """Occurrences with end >= window_start and start <= window_end, generated lazily."""
+    window_start = naive_utc(window_start) if window_start else None
+    window_end = naive_utc(window_end) if window_end else None
+    for start, end in occurrences(application, window_start):
+        if window_end is not None and start > window_end:
+            return
+        if window_start is None or end >= window_start:
+            yield start, end
+
+
+def occurrence_id(series_id: str, start: datetime) -> str:
+    return f"{series_id}@{start:%Y%m%dT%H%M%S}"
+
+
+def expand(application: dict, window_start: Optional[datetime], window_end: Optional[datetime]) -> Iterator[dict]:
+    """Occurrence documents of a series in the window, shaped like plain applications."""
+    for start, end in occurrences_between(application, window_start, window_end):
+        yield {
+            **application,
+            "_id": occurrence_id(application["_id"], start),
+            "series_id": application["_id"],
+            "start_time": start,
+            "end_time": end,
+        }
+
+
+def merge_occurrences(series: Iterable[dict], window_start, window_end) -> Iterator[dict]:
+    """All occurrences of several series in (start_time, _id) order, merged lazily."""
+    return heapq.merge(
+        *(expand(application, window_start, window_end) for application in series),
+        key=lambda document: (document["start_time"], document["_id"]),
+    )
+
+
+def overlaps(first: Sequence[Interval], second: Sequence[Interval]) -> bool:
+    """Whether two sorted lists of half-open intervals intersect, in one linear pass."""
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if first[i][0] < second[j][1] and second[j][0] < first[i][1]:
+            return True
+        if first[i][1] <= second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+class IntervalSet:
+    """
+    Half-open intervals that may overlap each other, kept as two sorted arrays so a
+    probe is two bisects instead of a scan over everything added so far.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+
+    def count_overlapping(self, start: datetime, end: datetime) -> int:
+        # Интервалы с концом <= start начинаются раньше end, поэтому разность счётчиков —
+        # ровно число пересечений с [start, end)
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return self.count_overlapping(start, end) > 0
+
+    def overlaps_any(self, booked: Iterable[Interval]) -> bool:
+        return any(self.overlaps(start, end) for start, end in booked)
+
+    def add(self, booked: Iterable[Interval]):
+        for start, end in booked:
+            insort(self.starts, start)
+            insort(self.ends, end)
+
+
+def span_filter(start_time: datetime, end_time: datetime) -> dict:
+    """Documents whose whole span (up to series_end for a series) may overlap [start_time, end_time)."""
+    return {
+        "start_time": {"$lt": end_time},
+        "$or": [{"end_time": {"$gt": start_time}}, {"series_end": {"$gt": start_time}}],
+    }
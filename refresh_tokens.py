@@ -0,0 +1,76 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from db import db
+from security import ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS, SECRET_KEY, create_access_token, create_refresh_token
+
+# Семейство — цепочка refresh-токенов от одного входа. В базе хранится один документ на
+# семейство с jti последнего выданного токена; устаревшие семейства удаляет TTL-индекс.
+# Предъявление уже использованного токена означает утечку: семейство отзывается целиком.
+# Access-токены не проверяются по базе — после отзыва они живут до своего exp.
+
+
+class RefreshTokenInvalid(Exception):
+    pass
+
+
+def _token_pair(user_id: str, family_id: str, jti: str, expires_at: datetime) -> dict:
+    access_token = create_access_token(data={"sub": user_id})
+    refresh_token = create_refresh_token(
+        data={"sub": user_id, "fam": family_id, "jti": jti},
+        expires_delta=expires_at - datetime.utcnow(),
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+async def issue_tokens(user_id: str) -> dict:
+    """Start a new token family (login, registration) and return an access/refresh pair."""
+    family_id, jti = str(uuid.uuid4()), str(uuid.uuid4())
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    await db.refresh_families.insert_one({
+        "_id": family_id,
+        "user_id": user_id,
+        "jti": jti,
+        "expires_at": expires_at,
+    })
+    return _token_pair(user_id, family_id, jti, expires_at)
+
+
+def decode_refresh_token(token: str) -> Optional[dict]:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh" or not all(payload.get(claim) for claim in ("sub", "fam", "jti")):
+        return None
+    return payload
+
+
+async def rotate(token: str) -> dict:
+    """
+    Exchange a refresh token for a new pair. The family's current jti is swapped in a
+    single findAndModify, so of two concurrent refreshes with the same token only one wins.
+    """
+    payload = decode_refresh_token(token)
+    if payload is None:
+        raise RefreshTokenInvalid()
+    now = datetime.utcnow()
+    jti = str(uuid.uuid4())
+    expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    family = await db.refresh_families.find_one_and_update(
+        {"_id": payload["fam"], "jti": payload["jti"], "expires_at": {"$gt": now}},
+        {"$set": {"jti": jti, "expires_at": expires_at}},
+        projection={"user_id": 1},
+    )
+    if family is None:
+        # Токен подписан нами, но уже не текущий — повторное использование, отзываем семейство
+        await revoke_family(payload["fam"])
+        raise RefreshTokenInvalid()
+    return _token_pair(family["user_id"], payload["fam"], jti, expires_at)
+
+
+async def revoke_family(family_id: str):
+    await db.refresh_families.delete_one({"_id": family_id})
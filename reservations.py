@@ -0,0 +1,183 @@
+from datetime import datetime, time, timedelta
+from typing import Iterable, List, Sequence, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from timeutils import naive_utc
+from db import db
+from recurrence import Interval, intervals
+import occupancy
+
+# Журнал брони: один документ на (комнату, день) со списком одобренных интервалов.
+# Проверка пересечения и запись брони — одно атомарное обновление документа, поэтому
+# две параллельные модерации не могут занять одно и то же время.
+
+
+def day_keys(room_id: str, start_time: datetime, end_time: datetime) -> List[Tuple[str, datetime]]:
+    start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+    day = datetime.combine(start_time.date(), time.min)
+    keys = []
+    while day < end_time or not keys:
+        keys.append((f"{room_id}:{day:%Y-%m-%d}", day))
+        day += timedelta(days=1)
+    return keys
+
+
+def claim_operation(key: str, day: datetime, room_id: str, application_id: str, start_time: datetime, end_time: datetime):
+    start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+    conflict = {
+        "$elemMatch": {
+            "application_id": {"$ne": application_id},
+            "start_time": {"$lt": end_time},
+            "end_time": {"$gt": start_time},
+        }
+    }
+    return (
+        {"_id": key, "bookings": {"$not": conflict}},
+        {
+            "$setOnInsert": {"room_id": room_id, "day": day},
+            "$addToSet": {
+                "bookings": {"application_id": application_id, "start_time": start_time, "end_time": end_time}
+            },
+            "$inc": {"version": 1},
+        },
+    )
+
+
+async def _claim_day(key: str, day: datetime, room_id: str, application_id: str, start_time, end_time) -> bool:
+    query, update = claim_operation(key, day, room_id, application_id, start_time, end_time)
+    # Если документ есть и в нём пересечение, фильтр не совпадёт и upsert упрётся в _id.
+    # Первый DuplicateKeyError может быть гонкой двух вставок нового дня — повторяем один раз.
+    for _ in range(2):
+        try:
+            await db.room_reservations.update_one(query, update, upsert=True)
+            return True
+        except DuplicateKeyError:
+            continue
+    return False
+
+
+async def claim(application_id: str, room_id: str, start_time: datetime, end_time: datetime) -> bool:
+    """Atomically reserve the interval in the room. Returns False on a conflict."""
+    claimed = []
+    for key, day in day_keys(room_id, start_time, end_time):
+        if not await _claim_day(key, day, room_id, application_id, start_time, end_time):
+            await release_keys(application_id, claimed)
+            return False
+        claimed.append(key)
+    await occupancy.refresh(claimed)
+    return True
+
+
+async def release_keys(application_id: str, keys: List[str]):
+    if keys:
+        await db.room_reservations.update_many(
+            {"_id": {"$in": keys}},
+            {"$pull": {"bookings": {"application_id": application_id}}, "$inc": {"version": 1}},
+        )
+        await occupancy.refresh(keys)
+
+
+async def release(application_id: str, room_id: str, start_time: datetime, end_time: datetime):
+    await release_keys(application_id, [key for key, _ in day_keys(room_id, start_time, end_time)])
+
+
+async def claim_intervals(application_id: str, room_id: str, booked: Sequence[Interval]) -> bool:
+    """Reserve every interval of an application (all occurrences of a series) or none of them."""
+    if len(booked) == 1:
+        return await claim(application_id, room_id, *booked[0])
+    # Вся серия проверяется и бронируется одним bulk_write, а не запросом на вхождение
+    return application_id in await claim_many(
+        (application_id, room_id, start_time, end_time) for start_time, end_time in booked
+    )
+
+
+async def release_intervals(application_id: str, room_id: str, booked: Sequence[Interval]):
+    keys = {key for start_time, end_time in booked for key, _ in day_keys(room_id, start_time, end_time)}
+    await release_keys(application_id, sorted(keys))
+
+
+async def _bulk_claim(operations: Sequence[Tuple[dict, dict]]) -> Set[int]:
+    """Run claim upserts in one unordered bulk_write; return indexes of operations that hit a conflict."""
+    try:
+        await db.room_reservations.bulk_write(
+            [UpdateOne(query, update, upsert=True) for query, update in operations],
+            ordered=False,
+        )
+    except BulkWriteError as exc:
+        errors = exc.details["writeErrors"]
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        return {error["index"] for error in errors}
+    return set()
+
+
+async def claim_many(bookings: Iterable[Tuple[str, str, datetime, datetime]]) -> Set[str]:
+    """
+    Claim (application_id, room_id, start_time, end_time) bookings in bulk.
+    Returns ids of applications whose whole interval was reserved; partial claims are rolled back.
+    """
+    operations, owners = [], []
+    for application_id, room_id, start_time, end_time in bookings:
+        for key, day in day_keys(room_id, start_time, end_time):
+            operations.append(claim_operation(key, day, room_id, application_id, start_time, end_time))
+            owners.append((application_id, key))
+    if not operations:
+        return set()
+
+    failed = await _bulk_claim(operations)
+    if failed:
+        # Повтор отделяет гонку вставки нового дня от настоящего пересечения
+        retry = sorted(failed)
+        failed = {retry[i] for i in await _bulk_claim([operations[i] for i in retry])}
+
+    failed_ids = {owners[i][0] for i in failed}
+    await release_many([owner for i, owner in enumerate(owners) if owner[0] in failed_ids and i not in failed])
+    await occupancy.refresh(key for application_id, key in owners if application_id not in failed_ids)
+    return {application_id for application_id, _ in owners} - failed_ids
+
+
+async def release_many(claims: Iterable[Tuple[str, str]]):
+    """Release (application_id, journal key) pairs in one bulk_write."""
+    claims = list(claims)
+    operations = [
+        UpdateOne({"_id": key}, {"$pull": {"bookings": {"application_id": application_id}}, "$inc": {"version": 1}})
+        for application_id, key in claims
+    ]
+    if operations:
+        await db.room_reservations.bulk_write(operations, ordered=False)
+        await occupancy.refresh(key for _, key in claims)
+
+
+async def backfill():
+    """Record already approved bookings in the journal. Idempotent."""
+    operations = []
+    async for application in db.applications.find(
+        {"status": "approved", "location.room_id": {"$exists": True}},
+        {"start_time": 1, "end_time": 1, "rrule": 1, "location.room_id": 1},
+    ):
+        room_id = application["location"]["room_id"]
+        for start_time, end_time in intervals(application):
+            for key, day in day_keys(room_id, start_time, end_time):
+                operations.append(UpdateOne(
+                    {"_id": key},
+                    {
+                        "$setOnInsert": {"room_id": room_id, "day": day},
+                        "$addToSet": {
+                            "bookings": {
+                                "application_id": application["_id"],
+                                "start_time": start_time,
+                                "end_time": end_time,
+                            }
+                        },
+                        "$inc": {"version": 1},
+                    },
+                    upsert=True,
+                ))
+        if len(operations) >= 1000:
+            await db.room_reservations.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db.room_reservations.bulk_write(operations, ordered=False)
+    await occupancy.rebuild()
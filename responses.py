@@ -0,0 +1,62 @@
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Sequence, Tuple, Type
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+
+from core.config import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Класс ответа по умолчанию для приложения: orjson в быстром режиме
+DefaultResponse = ORJSONResponse if settings.fast_responses else JSONResponse
+
+
+def wants_ndjson(request: Request, format: str | None) -> bool:
+    return format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+@lru_cache(maxsize=None)
+def _output_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(
+        (field.alias or name, None if field.is_required() else field.get_default())
+        for name, field in model.model_fields.items()
+    )
+
+
+def _project(model: Type[BaseModel], document: dict) -> dict:
+    return {key: document.get(key, default) for key, default in _output_fields(model)}
+
+
+async def _ndjson_lines(cursor, model: Type[BaseModel], trusted: bool) -> AsyncIterator[bytes]:
+    if trusted and settings.fast_responses:
+        async for document in cursor:
+            yield orjson.dumps(_project(model, document), option=orjson.OPT_APPEND_NEWLINE)
+        return
+    async for document in cursor:
+        yield model.model_validate(document).model_dump_json(by_alias=True).encode() + b"\n"
+
+
+def ndjson_response(cursor, model: Type[BaseModel], trusted: bool = False) -> StreamingResponse:
+    """Stream documents as NDJSON while the Motor cursor yields them."""
+    return StreamingResponse(_ndjson_lines(cursor, model, trusted), media_type=NDJSON_MEDIA_TYPE)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def render_json(model: Type[BaseModel], documents: Sequence[dict], trusted: bool = False) -> bytes:
+    """
+    Encode documents the way response_model would.
+    Trusted documents (ones this service wrote itself) skip validation in fast mode
+    and are only projected onto the model's fields before orjson encodes them.
+    """
+    if trusted and settings.fast_responses:
+        return orjson.dumps([_project(model, document) for document in documents])
+    adapter = _list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(documents), by_alias=True)
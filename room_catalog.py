@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from bisect import bisect_left
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Iterable, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db import db
+
+if TYPE_CHECKING:
+    from models import Room
+
+logger = logging.getLogger(__name__)
+
+# "The $changeStream stage is only supported on replica sets" — одиночный mongod
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class RoomCatalogUnavailable(Exception):
+    """Raised by every lookup before the first snapshot is loaded; served as 503."""
+
+
+class RoomSnapshot(NamedTuple):
+    """
+    Immutable view of the rooms collection; replaced as a whole, never modified.
+    Room is a frozen model, so the instances can be shared across requests.
+    """
+    rooms: Tuple["Room", ...]  # в порядке коллекции
+    by_id: Mapping[str, "Room"]
+    by_number: Mapping[Tuple[str, str], "Room"]
+    by_tower: Mapping[str, Tuple["Room", ...]]
+    by_capacity: Tuple["Room", ...]  # по возрастанию вместимости
+    capacities: Tuple[int, ...]  # параллельно by_capacity, для bisect
+
+
+EMPTY_SNAPSHOT = RoomSnapshot((), MappingProxyType({}), MappingProxyType({}), MappingProxyType({}), (), ())
+
+
+def build_snapshot(documents: Iterable[dict]) -> RoomSnapshot:
+    # models проверяет комнаты по каталогу, поэтому Room импортируется здесь
+    from models import Room
+
+    rooms = tuple(Room(**document) for document in documents)
+    by_tower = {}
+    for room in rooms:
+        by_tower.setdefault(room.tower, []).append(room)
+    by_capacity = tuple(sorted(rooms, key=lambda room: room.capacity))
+    return RoomSnapshot(
+        rooms=rooms,
+        by_id=MappingProxyType({room.id: room for room in rooms}),
+        by_number=MappingProxyType({(room.tower, room.name): room for room in rooms}),
+        by_tower=MappingProxyType({tower: tuple(tower_rooms) for tower, tower_rooms in by_tower.items()}),
+        by_capacity=by_capacity,
+        capacities=tuple(room.capacity for room in by_capacity),
+    )
+
+
+class RoomCatalog:
+    """
+    In-process copy of the rooms collection. Rooms almost never change, so listing and
+    lookups read the current snapshot without a query; follow() replaces it when the
+    collection changes.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._snapshot = EMPTY_SNAPSHOT
+
+    def load(self, documents: Iterable[dict]):
+        # Снимок собирается целиком и подменяется одной операцией
+        self._snapshot = build_snapshot(documents)
+        self.loaded = True
+
+    async def refresh(self):
+        self.load(await db.rooms.find({}).to_list(None))
+
+    async def refresh_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Room catalog refresh failed")
+
+    async def follow(self, interval: float, change_stream: bool = True):
+        """
+        Keep the snapshot current: reload on every change-stream event, or poll every
+        interval seconds where change streams are unavailable (standalone mongod).
+        """
+        while change_stream:
+            try:
+                async with db.rooms.watch() as stream:
+                    # Изменения между последней загрузкой и открытием потока не потеряются
+                    await self.refresh()
+                    async for _ in stream:
+                        await self.refresh()
+            except OperationFailure as exc:
+                if exc.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Room change streams unsupported, polling every %ss", interval)
+                    break
+                # Потеря истории, прерванный курсор и т.п. — поток открывается заново
+                logger.warning("Room change stream failed, reopening: %s", exc)
+                await asyncio.sleep(min(interval, 5))
+            except PyMongoError:
+                logger.exception("Room change stream failed, reopening")
+                await asyncio.sleep(min(interval, 5))
+        await self.refresh_periodically(interval)
+
+    def _current(self) -> RoomSnapshot:
+        # Пустой снимок до первой загрузки выдал бы «комнат нет» вместо ошибки
+        if not self.loaded:
+            raise RoomCatalogUnavailable()
+        return self._snapshot
+
+    def all(self, tower: Optional[str] = None) -> Sequence["Room"]:
+        snapshot = self._current()
+        return snapshot.rooms if tower is None else snapshot.by_tower.get(tower, ())
+
+    def get(self, room_id: str) -> Optional["Room"]:
+        return self._current().by_id.get(room_id)
+
+    def find(self, tower: str, room_number: str) -> Optional["Room"]:
+        return self._current().by_number.get((tower, room_number))
+
+    def with_capacity(self, capacity: int) -> Sequence["Room"]:
+        """Rooms with capacity >= the given one, smallest first."""
+        snapshot = self._current()
+        return snapshot.by_capacity[bisect_left(snapshot.capacities, capacity):]
+
+
+room_catalog = RoomCatalog()
@@ -1,72 +1,78 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Dict, Any
-from datetime import date, datetime, time
-from db import db
-from models import Room, BookedSlot, RoomAvailabilityResponse
-from security import get_current_user
-from auth import get_user_from_db
+from datetime import date, datetime, time, timedelta
+from availability import find_bookings, find_busy_room_ids
+from booking_index import booking_index
+from room_catalog import room_catalog
+from models import Room, BookedSlot, RoomAvailabilityResponse, User, TowerOccupancyResponse
+import occupancy
+from security import role_checker
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Room])
 async def get_all_rooms(
     tower: str | None = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(role_checker(["student", "curator"]))
 ):
     """
     Get All Rooms, optionally filtered by tower.
     Accessible to authenticated users (student, curator).
     """
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Не аутентифицирован")
+    return room_catalog.all(tower)
 
-    user = await get_user_from_db(current_user["email"])
-    if user["role"] not in ["student", "curator"]:
-        raise HTTPException(status_code=403, detail="Доступ запрещен")
-
-    query = {}
-    if tower:
-        query["tower"] = tower
-    
-    all_rooms = await db.rooms.find(query).to_list(1000)
-
-    return [Room(**room_data) for room_data in all_rooms]
+@router.get("/occupancy", response_model=TowerOccupancyResponse)
+async def get_tower_occupancy(
+    tower: str,
+    week_start: date | None = None,
+    current_user: User = Depends(role_checker(["student", "curator"]))
+):
+    """
+    Get the occupancy grid of every room in a tower for a week (7 days from week_start,
+    Monday of the current week by default). Each day is a string of 96 characters,
+    one per 15-minute slot from 00:00, '1' meaning booked.
+    """
+    if week_start is None:
+        today = date.today()
+        week_start = today - timedelta(days=today.weekday())
+
+    rooms = room_catalog.all(tower)
+    grid = await occupancy.week_grid([room.id for room in rooms], week_start)
+
+    return {
+        "tower": tower,
+        "week_start": week_start,
+        "slot_minutes": occupancy.SLOT_MINUTES,
+        "rooms": [
+            {"room_id": room.id, "name": room.name, "capacity": room.capacity, "days": grid[room.id]}
+            for room in rooms
+        ],
+    }
 
 @router.get("/{id}/availability", response_model=RoomAvailabilityResponse)
-async def get_room_availability(id: str, date: date, current_user: dict = Depends(get_current_user)):
+async def get_room_availability(id: str, date: date, current_user: User = Depends(role_checker(["student", "curator"]))):
     """
     Get the availability of a room for a specific date.
     Returns a list of booked time slots.
     """
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Не аутентифицирован")
-
-    user = await get_user_from_db(current_user["email"])
-    if user["role"] not in ["student", "curator"]:
-        raise HTTPException(status_code=403, detail="Доступ запрещен")
-
-    room = await db.rooms.find_one({"_id": id})
-    if not room:
+    if room_catalog.get(id) is None:
         raise HTTPException(status_code=404, detail="Комната не найдена")
 
     start_of_day = datetime.combine(date, time.min)
-    end_of_day = datetime.combine(date, time.max)
-
-    applications = await db.event_applications.find({
-        "room_id": id,
-        "status": "approved",
-        "start_time": {"$gte": start_of_day, "$lt": end_of_day}
-    }).to_list(1000)
-
-    booked_slots: List[BookedSlot] = []
-    for app in applications:
-        booked_slots.append(
-            BookedSlot(
-                title=app["title"],
-                start_time=app["start_time"],
-                end_time=app["end_time"],
-            )
+    if booking_index.covers(start_of_day):
+        bookings = booking_index.bookings_on(id, date)
+    else:
+        # До загрузки индекса и для дней до его горизонта пустой список выглядел бы как свободная комната
+        bookings = await find_bookings(id, start_of_day, start_of_day + timedelta(days=1))
+
+    booked_slots: List[BookedSlot] = [
+        BookedSlot(
+            title=booking.title,
+            start_time=booking.start_time,
+            end_time=booking.end_time,
         )
+        for booking in bookings
+    ]
 
     return {"date": date, "booked_slots": booked_slots}
 
@@ -80,48 +86,33 @@ async def find_available_rooms(
     start_time: datetime,
     end_time: datetime,
     capacity: int | None = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(role_checker(["student", "curator"]))
 ):
     """
     Find available rooms within a specified time interval and optional capacity.
     Accessible to authenticated users (student, curator).
     """
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Не аутентифицирован")
-
-    user = await get_user_from_db(current_user["email"])
-    if user["role"] not in ["student", "curator"]:
-        raise HTTPException(status_code=403, detail="Доступ запрещен")
-
-    query = {}
-    if capacity:
-        query["capacity"] = {"$gte": capacity}
-
-    all_rooms = await db.rooms.find(query).to_list(1000)
-    available_rooms = []
-
-    for room_data in all_rooms:
-        room = Room(**room_data)
-        
-        # Check for conflicting applications
-        conflicting_applications = await db.event_applications.find({
-            "location.room_id": room.id,
-            "status": "approved",
-            "$or": [
-                {
-                    "start_time": {"$lt": end_time},
-                    "end_time": {"$gt": start_time}
-                },
-                {
-                    "start_time": {"$gte": start_time, "$lt": end_time}
-                },
-                {
-                    "end_time": {"$gt": start_time, "$lte": end_time}
-                }
-            ]
-        }).to_list(1) # We only need to know if there's *any* conflict
-
-        if not conflicting_applications:
-            available_rooms.append(room)
-            
-    return available_rooms
+    # Комнаты читаются из каталога в памяти; с capacity — срез отсортированного массива
+    rooms = room_catalog.with_capacity(capacity) if capacity else room_catalog.all()
+    if booking_index.covers(start_time):
+        busy_room_ids = booking_index.busy_room_ids(start_time, end_time)
+    else:
+        busy_room_ids = await find_busy_room_ids(start_time, end_time)
+    return [room for room in rooms if room.id not in busy_room_ids]
+
+
+@router.get("/bookings-index/check")
+async def check_booking_index(current_user: User = Depends(role_checker(["admin"]))):
+    """
+    Compare the in-memory booking index with the database.
+    """
+    return await booking_index.check()
+
+
+@router.post("/bookings-index/rebuild")
+async def rebuild_booking_index(current_user: User = Depends(role_checker(["admin"]))):
+    """
+    Reload the in-memory booking index from the database.
+    """
+    await booking_index.rebuild()
+    return await booking_index.check()
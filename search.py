@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from pagination import SORT, encode_cursor, keyset_query
+
+# Страница результатов — отдельная агрегация по индексу, фасеты — ещё одна, только для
+# первой страницы. Каждый фасет учитывает все фильтры, кроме собственного, чтобы при
+# выбранном типе были видны счётчики и остальных типов.
+FACETS = {
+    "event_type": "$event_type",
+    "tower": "$location.tower",
+    "month": {"$dateToString": {"format": "%Y-%m", "date": "$start_time"}},
+}
+
+
+def month_range(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def facet_filters(event_type: Optional[str], tower: Optional[str], month: Optional[str]) -> Dict[str, dict]:
+    filters = {}
+    if event_type:
+        filters["event_type"] = {"event_type": event_type}
+    if tower:
+        filters["tower"] = {"location.tower": tower}
+    if month:
+        start, end = month_range(month)
+        filters["month"] = {"start_time": {"$gte": start, "$lt": end}}
+    return filters
+
+
+def _merge(filters: List[dict]) -> dict:
+    return {"$and": filters} if filters else {}
+
+
+def encode_score_cursor(document: dict) -> str:
+    raw = json.dumps([document["score"], str(document["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_score_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, document_id = json.loads(raw)
+        return float(score), document_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор")
+
+
+def _base_match(query: dict, text: Optional[str]) -> dict:
+    match = dict(query)
+    if text:
+        match["$text"] = {"$search": text}
+    return match
+
+
+def page_pipeline(
+    query: dict,
+    text: Optional[str],
+    filters: Dict[str, dict],
+    cursor: Optional[str],
+    limit: int,
+) -> List[dict]:
+    """
+    The ranked page alone: every filter and the cursor go into the leading $match, so
+    $match + $sort + $limit can use an index and stop after limit + 1 documents.
+    """
+    match = _merge([_base_match(query, text)] + list(filters.values()))
+    if not text:
+        return [{"$match": keyset_query(match, cursor)}, {"$sort": dict(SORT)}, {"$limit": limit + 1}]
+
+    # Ранжирование по textScore, при равенстве — по _id; курсор хранит (score, _id)
+    pipeline = [{"$match": match}, {"$addFields": {"score": {"$meta": "textScore"}}}]
+    if cursor:
+        score, document_id = decode_score_cursor(cursor)
+        pipeline.append({"$match": {"$or": [{"score": {"$lt": score}}, {"score": score, "_id": {"$gt": document_id}}]}})
+    return pipeline + [{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit + 1}]
+
+
+def facet_pipeline(query: dict, text: Optional[str], filters: Dict[str, dict]) -> List[dict]:
+    """Per-facet counts over the base query; each facet applies every filter except its own."""
+    stages = {}
+    for name, expression in FACETS.items():
+        others = [value for key, value in filters.items() if key != name]
+        stages[name] = [
+            {"$match": _merge(others)},
+            {"$group": {"_id": expression, "count": {"$sum": 1}}},
+            {"$match": {"_id": {"$ne": None}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ]
+    return [{"$match": _base_match(query, text)}, {"$facet": stages}]
+
+
+async def search(
+    collection,
+    query: dict,
+    text: Optional[str],
+    filters: Dict[str, dict],
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[List[dict], Optional[Dict[str, List[dict]]], Optional[str]]:
+    """Return (page, facets, next_cursor). Facets are computed for the first page only."""
+    page = collection.aggregate(page_pipeline(query, text, filters, cursor, limit)).to_list(None)
+    if cursor is None:
+        documents, counts = await asyncio.gather(
+            page, collection.aggregate(facet_pipeline(query, text, filters)).to_list(None)
+        )
+    else:
+        documents, counts = await page, None
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_score_cursor(documents[-1]) if text else encode_cursor(documents[-1])
+
+    facets = None
+    if counts is not None:
+        facets = {
+            name: [{"value": str(bucket["_id"]), "count": bucket["count"]} for bucket in counts[0][name]]
+            for name in FACETS
+        }
+    return documents, facets, next_cursor
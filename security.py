@@ -1,4 +1,6 @@
-from passlib.context import CryptContext
+import time
+from collections import OrderedDict
+
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional, List
@@ -8,6 +10,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 
+from core.config import settings
 from db import db
 from models import User
 
@@ -16,22 +19,15 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -41,37 +37,96 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "refresh"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class PrincipalCache:
+    """
+    LRU cache of resolved users with a TTL, keyed by user id.
+    Entries must be invalidated when a user's role or password changes. The cache is
+    per worker, so other workers may keep a changed user for up to PRINCIPAL_CACHE_TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+
+    def put(self, user: User):
+        if self.maxsize <= 0:
+            return
+        self._entries[user.id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.principal_cache_size, settings.principal_cache_ttl)
+
+
 async def get_user_from_db(user_id: str):
-    user = await db.users.find_one({"_id": user_id})
-    if user:
-        return User(**user)
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return user
+    user_data = await db.users.find_one({"_id": user_id})
+    if user_data:
+        user = User(**user_data)
+        principal_cache.put(user)
+        return user
 
 class TokenData(BaseModel):
     user_id: str | None = None
 
 
+def decode_user_id(token: str) -> Optional[str]:
+    """Stateless part of authentication: verify the JWT and return its subject."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    # Refresh-токен живёт неделю и не должен подходить вместо access-токена
+    if payload.get("type") != "access":
+        return None
+    return payload.get("sub")
+
+
+async def user_from_token(token: str) -> Optional[User]:
+    user_id = decode_user_id(token)
+    if user_id is None:
+        return None
+    return await get_user_from_db(user_id)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Данные не соответствуют формату",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except JWTError:
-        raise credentials_exception
-    user = await db.users.find_one({"_id": token_data.user_id})
+    # FastAPI кэширует зависимость в пределах запроса, поэтому role_checker и
+    # сам get_current_user разрешают пользователя один раз на запрос
+    user = await user_from_token(token)
     if user is None:
         raise credentials_exception
-    return User(**user)
+    return user
 
 
 def role_checker(allowed_roles: List[str]):
@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Настройки читаются при импорте core.config; токен должен пройти проверку формата aiogram
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DATABASE_NAME", "univent_test")
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:test")
@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+import auth
+from db import db
+from models import UserCreate
+
+
+async def _register_taken_email(monkeypatch):
+    db.connect(AsyncMongoMockClient())
+    try:
+        await db.users.create_index("email", unique=True)
+        await db.users.insert_one({"_id": "user-1", "full_name": "Первый", "email": "t@example.com"})
+        find_one = type(db.users).find_one
+
+        async def find_one_before_insert(self, query, *args, **kwargs):
+            # Параллельная регистрация вставила документ уже после нашей проверки email
+            if "email" in query:
+                return None
+            return await find_one(self, query, *args, **kwargs)
+
+        async def fast_hash(password):
+            return "hashed"
+
+        monkeypatch.setattr(type(db.users), "find_one", find_one_before_insert)
+        monkeypatch.setattr(auth.password_hasher, "hash", fast_hash)
+        user_in = UserCreate(full_name="Второй", email="t@example.com", password="secret")
+        try:
+            await auth.register(user_in)
+        except HTTPException as exc:
+            return exc
+    finally:
+        db.close()
+
+
+def test_registration_race_on_email_is_400(monkeypatch):
+    error = asyncio.run(_register_taken_email(monkeypatch))
+    assert error is not None and error.status_code == 400
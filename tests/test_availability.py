@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from availability import find_bookings
+from booking_index import BookingIndex
+from db import db
+
+APPLICATIONS = [
+    {
+        "_id": "single",
+        "title": "Лекция",
+        "status": "approved",
+        "location": {"type": "dukat", "room_id": "room-1"},
+        "start_time": datetime(2025, 9, 3, 10),
+        "end_time": datetime(2025, 9, 3, 12),
+    },
+    {
+        "_id": "series",
+        "title": "Клуб",
+        "status": "approved",
+        "location": {"type": "dukat", "room_id": "room-1"},
+        "start_time": datetime(2025, 9, 1, 18),
+        "end_time": datetime(2025, 9, 1, 20),
+        "rrule": "FREQ=DAILY;COUNT=10",
+        "series_end": datetime(2025, 9, 10, 20),
+    },
+    {
+        "_id": "pending",
+        "title": "Черновик",
+        "status": "pending",
+        "location": {"type": "dukat", "room_id": "room-1"},
+        "start_time": datetime(2025, 9, 3, 14),
+        "end_time": datetime(2025, 9, 3, 15),
+    },
+    {
+        "_id": "other-room",
+        "title": "Семинар",
+        "status": "approved",
+        "location": {"type": "dukat", "room_id": "room-2"},
+        "start_time": datetime(2025, 9, 3, 9),
+        "end_time": datetime(2025, 9, 3, 10),
+    },
+]
+
+
+async def _bookings_from_mongo(day: date):
+    db.connect(AsyncMongoMockClient())
+    try:
+        await db.applications.insert_many(APPLICATIONS)
+        start_of_day = datetime.combine(day, time.min)
+        return await find_bookings("room-1", start_of_day, start_of_day + timedelta(days=1))
+    finally:
+        db.close()
+
+
+def test_mongo_fallback_matches_booking_index():
+    day = date(2025, 9, 3)
+    index = BookingIndex()
+    index.load(APPLICATIONS)
+    from_mongo = asyncio.run(_bookings_from_mongo(day))
+    assert [booking.application_id for booking in from_mongo] == ["single", "series"]
+    assert from_mongo == index.bookings_on("room-1", day)
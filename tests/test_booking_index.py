@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from booking_index import BookingIndex
+
+HORIZON = datetime(2025, 9, 5)
+
+SERIES = {
+    "_id": "series",
+    "title": "Клуб",
+    "status": "approved",
+    "location": {"type": "dukat", "room_id": "room-1"},
+    "start_time": datetime(2025, 9, 1, 18),
+    "end_time": datetime(2025, 9, 1, 20),
+    "rrule": "FREQ=DAILY;COUNT=10",
+}
+PAST = {
+    "_id": "past",
+    "title": "Лекция",
+    "status": "approved",
+    "location": {"type": "dukat", "room_id": "room-2"},
+    "start_time": datetime(2025, 9, 2, 10),
+    "end_time": datetime(2025, 9, 2, 12),
+}
+
+
+def test_load_keeps_only_bookings_after_horizon():
+    index = BookingIndex()
+    index.load([SERIES, PAST], HORIZON)
+    starts = [booking.start_time for booking in index._by_application["series"][1]]
+    assert starts[0] == datetime(2025, 9, 5, 18) and len(starts) == 6
+    assert "past" not in index._by_application
+    assert index.covers(datetime(2025, 9, 5, 9))
+    assert not index.covers(datetime(2025, 9, 4, 9))
+
+
+def test_change_events_update_index():
+    index = BookingIndex()
+    index.load([], HORIZON)
+    index._apply_change({"operationType": "insert", "documentKey": {"_id": "series"}, "fullDocument": SERIES})
+    assert not index.is_free("room-1", datetime(2025, 9, 6, 19), datetime(2025, 9, 6, 21))
+    cancelled = {**SERIES, "status": "rejected"}
+    index._apply_change({"operationType": "update", "documentKey": {"_id": "series"}, "fullDocument": cancelled})
+    assert index.is_free("room-1", datetime(2025, 9, 6, 19), datetime(2025, 9, 6, 21))
+    index._apply_change({"operationType": "insert", "documentKey": {"_id": "series"}, "fullDocument": SERIES})
+    index._apply_change({"operationType": "delete", "documentKey": {"_id": "series"}})
+    assert index.busy_room_ids(datetime(2025, 9, 5), datetime(2025, 9, 11)) == set()
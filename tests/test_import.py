@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from starlette.requests import Request
+
+from applications import import_applications
+from db import db
+from models import User
+from room_catalog import RoomCatalog, RoomCatalogUnavailable
+
+USER = User(_id="user-1", full_name="Тест", email="t@example.com", hashed_password="-")
+
+
+def _row(title: str) -> dict:
+    return {
+        "title": title,
+        "description": "Описание",
+        "start_time": "2025-09-01T10:00:00",
+        "end_time": "2025-09-01T12:00:00",
+        "expected_participants": 10,
+        "needs": "Проектор",
+        "event_type": "ONLINE",
+    }
+
+
+def _request(rows) -> Request:
+    body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {"type": "http", "method": "POST", "path": "/applications/import", "query_string": b"", "headers": []}
+    return Request(scope, receive)
+
+
+async def _import(rows):
+    db.connect(AsyncMongoMockClient())
+    try:
+        # Уникальный title — способ получить ошибку записи посреди пакета
+        await db.applications.create_index("title", unique=True)
+        await db.applications.insert_one({"_id": "existing", "title": "Дубликат"})
+        result = await import_applications(_request(rows), format="ndjson", current_user=USER)
+        return result, await db.applications.count_documents({})
+    finally:
+        db.close()
+
+
+def test_write_errors_are_reported_per_row(monkeypatch):
+    monkeypatch.setattr("applications.room_catalog.loaded", True)
+    rows = [_row("Первое"), _row("Дубликат"), {"title": "без полей"}, _row("Второе")]
+    result, stored = asyncio.run(_import(rows))
+    assert (result.inserted, result.failed) == (2, 2)
+    assert sorted(error.line for error in result.errors) == [2, 3]
+    assert stored == 3
+
+
+def test_import_waits_for_room_catalog(monkeypatch):
+    monkeypatch.setattr("applications.room_catalog", RoomCatalog())
+    with pytest.raises(RoomCatalogUnavailable):
+        asyncio.run(_import([_row("Первое")]))
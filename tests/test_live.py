@@ -0,0 +1,57 @@
+import asyncio
+import json
+import socket
+from datetime import datetime
+
+import uvicorn
+import websockets
+from fastapi import FastAPI
+
+from live import publish_moderation, router
+from models import User
+from security import create_access_token, principal_cache
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _receive_moderation():
+    user = User(_id="user-1", full_name="Тест", email="t@example.com", hashed_password="-")
+    principal_cache.put(user)
+    token = create_access_token({"sub": user.id})
+
+    app = FastAPI()
+    app.include_router(router, prefix="/live")
+    port = _free_port()
+    # Настоящий uvicorn, а не TestClient: проверяется, что сервер умеет апгрейд до WebSocket
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    serving = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.01)
+        async with websockets.connect(f"ws://127.0.0.1:{port}/live/ws?token={token}") as websocket:
+            # Подписка появляется после accept; даём обработчику дойти до неё
+            await asyncio.sleep(0.1)
+            await publish_moderation({
+                "_id": "application-1",
+                "organizer_id": user.id,
+                "status": "approved",
+                "title": "Хакатон",
+                "location": {"type": "dukat", "room_id": "room-1"},
+                "start_time": datetime(2025, 9, 1, 10),
+                "end_time": datetime(2025, 9, 1, 12),
+            })
+            return json.loads(await asyncio.wait_for(websocket.recv(), timeout=5))
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def test_websocket_receives_published_moderation():
+    message = asyncio.run(_receive_moderation())
+    assert message["type"] == "moderation"
+    assert message["application_id"] == "application-1"
+    assert message["status"] == "approved"
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import REQUEST_LATENCY, MetricsMiddleware
+
+
+def _observed(method: str, route: str, status: str) -> float:
+    return REQUEST_LATENCY.labels(method, route, status)._sum.get()
+
+
+def test_route_label_includes_prefixes():
+    router = APIRouter()
+
+    @router.get("/{id}/availability")
+    async def availability(id: str):
+        return {}
+
+    admin = FastAPI()
+
+    @admin.get("/stats/{day}")
+    async def stats(day: str):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/rooms")
+    app.mount("/admin", admin)
+    app.add_middleware(MetricsMiddleware)
+
+    client = TestClient(app)
+    assert client.get("/rooms/r1/availability").status_code == 200
+    assert client.get("/admin/stats/2025-09-01").status_code == 200
+    assert _observed("GET", "/rooms/{id}/availability", "200") > 0
+    assert _observed("GET", "/admin/stats/{day}", "200") > 0
+    assert _observed("GET", "/stats/{day}", "200") == 0
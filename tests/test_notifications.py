@@ -0,0 +1,38 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from db import db
+from notifications import NotificationWorker, enqueue_notification
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+async def _run_two_workers():
+    db.connect(AsyncMongoMockClient())
+    try:
+        for chat_id in range(5):
+            await enqueue_notification(chat_id, "Событие разрешено")
+        bots = [RecordingBot(), RecordingBot()]
+        workers = [NotificationWorker(bot, poll_interval=0.01) for bot in bots]
+        tasks = [asyncio.create_task(worker.run()) for worker in workers]
+        await asyncio.sleep(0.3)
+        for worker in workers:
+            worker.stop()
+        await asyncio.gather(*tasks)
+        return bots, await db.leases.count_documents({})
+    finally:
+        db.close()
+
+
+def test_only_lease_holder_sends():
+    bots, leases = asyncio.run(_run_two_workers())
+    assert sorted(len(bot.sent) for bot in bots) == [0, 5]
+    # Остановленный владелец отпускает аренду
+    assert leases == 0
@@ -0,0 +1,61 @@
+import asyncio
+
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from ratelimit import ConcurrencyLimiter, MemoryRateLimitBackend, RateLimitMiddleware, RouteGroup
+
+NGINX = "172.28.0.10"
+
+
+def _stack(seen_keys):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    limiter = RateLimitMiddleware(
+        app,
+        MemoryRateLimitBackend(),
+        groups=[RouteGroup("auth", ("POST",), ("/auth/login",), ConcurrencyLimiter(10, float("inf")), 1, 1)],
+    )
+    original = limiter._bucket_key
+
+    def bucket_key(group, scope):
+        key = original(group, scope)
+        seen_keys.append(key)
+        return key
+
+    limiter._bucket_key = bucket_key
+    return ProxyHeadersMiddleware(limiter, trusted_hosts=NGINX)
+
+
+def _request(app, client, forwarded_for=None):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    scope = {"type": "http", "method": "POST", "path": "/auth/login", "headers": headers, "client": (client, 50000)}
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    asyncio.run(app(scope, receive, send))
+    return statuses[0]
+
+
+def test_spoofed_forwarded_for_does_not_change_bucket():
+    keys = []
+    app = _stack(keys)
+    # nginx дописал реальный адрес справа, всё левее прислал клиент
+    assert _request(app, NGINX, "1.1.1.1, 203.0.113.7") == 200
+    assert _request(app, NGINX, "2.2.2.2, 203.0.113.7") == 429
+    assert keys == ["auth:ip:203.0.113.7", "auth:ip:203.0.113.7"]
+
+
+def test_forwarded_for_from_untrusted_peer_is_ignored():
+    keys = []
+    app = _stack(keys)
+    assert _request(app, "198.51.100.9", "1.1.1.1") == 200
+    assert _request(app, "198.51.100.9", "2.2.2.2") == 429
+    assert keys == ["auth:ip:198.51.100.9", "auth:ip:198.51.100.9"]
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from recurrence import MAX_OCCURRENCES, intervals, validate
+
+START = datetime(2025, 9, 1, 10)
+END = datetime(2025, 9, 1, 12)
+
+
+def _until(occurrences: int) -> str:
+    # UNTIL в виде даты включает весь день последнего вхождения
+    return f"{START + timedelta(days=occurrences - 1):%Y%m%d}"
+
+
+@pytest.mark.parametrize(
+    "rrule",
+    [f"FREQ=DAILY;COUNT={MAX_OCCURRENCES}", f"FREQ=DAILY;UNTIL={_until(MAX_OCCURRENCES)}"],
+)
+def test_series_of_max_occurrences_is_accepted(rrule):
+    canonical = validate(rrule, START, END)
+    assert len(intervals({"start_time": START, "end_time": END, "rrule": canonical})) == MAX_OCCURRENCES
+
+
+@pytest.mark.parametrize(
+    "rrule",
+    [f"FREQ=DAILY;COUNT={MAX_OCCURRENCES + 1}", f"FREQ=DAILY;UNTIL={_until(MAX_OCCURRENCES + 1)}"],
+)
+def test_series_over_max_occurrences_is_rejected(rrule):
+    with pytest.raises(ValueError):
+        validate(rrule, START, END)
+
+
+def test_weekly_until_counts_every_listed_day():
+    # Две встречи в неделю: 260 недель дают ровно MAX_OCCURRENCES вхождений
+    last = START + timedelta(weeks=MAX_OCCURRENCES // 2 - 1, days=2)
+    validate(f"FREQ=WEEKLY;BYDAY=MO,WE;UNTIL={last:%Y%m%d}", START, END)
+    with pytest.raises(ValueError):
+        validate(f"FREQ=WEEKLY;BYDAY=MO,WE;UNTIL={last + timedelta(days=5):%Y%m%d}", START, END)
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+
+
+def naive_utc(value: datetime) -> datetime:
+    # Mongo отдаёт наивные datetime в UTC, а в query-параметрах может прийти смещение
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value